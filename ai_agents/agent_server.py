@@ -0,0 +1,518 @@
+"""
+Multi-session HTTP server for the agents in openai_agents.
+
+One process hosts many independent conversations. Each session keeps its own
+current Agent, message history and context window; a reply streams back as
+server-sent events while the turn runs, and tools that ask the user
+something (execute_order's confirmation) send the question to the client and
+wait for its answer instead of blocking on input().
+
+Usage:
+    python agent_server.py [--host 127.0.0.1] [--port 8090] [--workers 256]
+                           [--sessions-dir DIR | --no-store]
+    python agent_server.py --chat http://127.0.0.1:8090 [--agent triage]
+
+API (JSON bodies):
+    POST   /sessions                 {"agent": "triage"} -> {"session_id", "agent"}
+    GET    /sessions/<id>            -> {"session_id", "agent", "messages", "busy"}
+    DELETE /sessions/<id>            (409 while a turn is running)
+    POST   /sessions/<id>/messages   {"content": "..."} -> text/event-stream of
+           delta {"text"}, ask {"id", "prompt"},
+           done {"agent", "content", "tool_cache_hits"}, error {"message"}
+    POST   /sessions/<id>/answers    {"id", "answer"}
+    GET    /health                   -> {"sessions", "busy"}
+
+Turns run on a thread pool because run_full_turn and the tools are blocking;
+a session holds a thread only while one of its turns is running.
+
+With a SessionStore every turn is appended to the session's log, and a
+session that is not in memory (expired, or the server restarted) is loaded
+back from its log on the next request.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import openai_agents
+import tool_cache
+from context_window import ContextWindow
+from message_store import Message, SessionStore
+
+AGENTS = {
+    "triage": openai_agents.triage_agent,
+    "sales": openai_agents.sales_agent,
+    "issues": openai_agents.issues_and_repairs_agent,
+    "refunds": openai_agents.refund_agent,
+    "sales_assistant": openai_agents.sales_assistant,
+}
+
+_ROUTE = re.compile(r"^/sessions(?:/([\w-]+)(?:/(messages|answers))?)?/?$")
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 503: "Service Unavailable"}
+
+
+class Session:
+    """
+    One conversation.
+
+    Args:
+        session_id (str): Identifier used in URLs
+        agent (Agent): Agent the conversation starts with
+    """
+
+    def __init__(self, session_id, agent):
+        self.id = session_id
+        self.agent = agent
+        self.messages = []
+        self.context = ContextWindow(strategy="summarize", summarizer=openai_agents.summarize_history)
+        self.lock = asyncio.Lock()  # one turn at a time
+        self.questions = {}  # question id -> Future of the answer
+        self.last_active = time.monotonic()
+
+    def describe(self):
+        return {
+            "session_id": self.id,
+            "agent": self.agent.name,
+            "messages": len(self.messages),
+            "busy": self.lock.locked(),
+        }
+
+
+class AgentServer:
+    """
+    Holds the sessions and serves the HTTP API.
+
+    Args:
+        workers (int): Turns that can run at once
+        ask_timeout (float): Seconds a tool waits for the client to answer a
+            question before taking an empty answer
+        session_ttl (float): Idle seconds before a session is dropped
+        max_sessions (int): Sessions kept at once
+        store (SessionStore, optional): Logs sessions so they outlive the
+            process; without it a session ends when it expires
+    """
+
+    def __init__(self, workers=256, ask_timeout=300.0, session_ttl=3600.0, max_sessions=10000,
+                 store=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.ask_timeout = ask_timeout
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.store = store
+        self.sessions = {}
+        self._server = None
+        self._sweeper = None
+
+    # --- Sessions and turns ---
+
+    def create_session(self, agent_name="triage"):
+        """
+        Start a conversation.
+
+        Args:
+            agent_name (str): Key of AGENTS to start with
+
+        Returns:
+            Session: The new session
+
+        Raises:
+            KeyError: For an unknown agent name
+        """
+        agent = AGENTS[agent_name]
+        session = Session(uuid.uuid4().hex, agent)
+        self.sessions[session.id] = session
+        if self.store is not None:
+            self.store.append(session.id, [], agent=agent.name)
+        return session
+
+    def get_session(self, session_id):
+        """
+        Find a session, loading it from the store if it is not in memory.
+
+        Args:
+            session_id (str): Session id from the URL
+
+        Returns:
+            Session or None: None if there is no such session
+        """
+        session = self.sessions.get(session_id)
+        if session is not None or self.store is None:
+            return session
+        try:
+            loaded = self.store.load(session_id)
+        except ValueError:  # not a valid log name
+            return None
+        if loaded is None:
+            return None
+        messages, agent_name = loaded
+        session = Session(session_id, openai_agents.agent_named(agent_name) or AGENTS["triage"])
+        session.messages = messages
+        self.sessions[session_id] = session
+        return session
+
+    async def run_turn(self, session, content, send, disconnected=None):
+        """
+        Run one user message through the session's agent, streaming events.
+
+        The turn is kept in the session even if the client disconnects
+        midway; questions asked after that get an empty answer.
+
+        Args:
+            session (Session): Conversation to continue
+            content (str): User message
+            send (callable): Coroutine function taking (event, data)
+            disconnected (Future, optional): Done once the client has gone away
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        client_gone = False
+
+        def emit(event, data):
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        async def ask_client(prompt):
+            if client_gone:
+                return ""
+            question_id = uuid.uuid4().hex[:12]
+            answer = session.questions[question_id] = loop.create_future()
+            events.put_nowait(("ask", {"id": question_id, "prompt": prompt}))
+            try:
+                return await asyncio.wait_for(answer, self.ask_timeout)
+            except asyncio.TimeoutError:
+                return ""
+            finally:
+                session.questions.pop(question_id, None)
+
+        def ask(prompt):  # runs on the turn's thread
+            return asyncio.run_coroutine_threadsafe(ask_client(prompt), loop).result()
+
+        messages = session.messages + [Message("user", content)]
+
+        def work():
+            try:
+                response = openai_agents.run_full_turn(
+                    session.agent, messages, stream=True, context=session.context,
+                    on_delta=lambda text: emit("delta", {"text": text}),
+                )
+                if self.store is not None:
+                    self.store.append(
+                        session.id, messages[-1:] + response.messages,
+                        agent=response.agent.name if response.agent is not session.agent else None,
+                    )
+                return response
+            finally:
+                emit(None, None)
+
+        # the turn's thread (and the tool threads it starts) answer through ask()
+        context = contextvars.copy_context()
+        context.run(openai_agents.ask_user.set, ask)
+        context.run(tool_cache.current_session.set, session.id)
+        turn = loop.run_in_executor(self.pool, context.run, work)
+
+        def drop_client():
+            nonlocal client_gone
+            client_gone = True
+            # let waiting tools carry on with no answer
+            for answer in list(session.questions.values()):
+                if not answer.done():
+                    answer.set_result("")
+
+        async def deliver(event, data):
+            if client_gone:
+                return
+            try:
+                await send(event, data)
+            except ConnectionError:
+                drop_client()
+
+        while True:
+            if disconnected is not None and not client_gone:
+                # a tool may be waiting on the client, so notice it leaving between events
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait((getter, disconnected), return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    drop_client()
+                    continue
+                event, data = getter.result()
+            else:
+                event, data = await events.get()
+            if event is None:
+                break
+            await deliver(event, data)
+
+        try:
+            response = await turn
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:  # even SystemExit from a tool ends only this turn
+            await deliver("error", {"message": str(e) or type(e).__name__})
+            return
+        session.messages = messages + response.messages
+        session.agent = response.agent
+        reply = next((getattr(message, "content", None) for message in reversed(response.messages)
+                      if getattr(message, "role", None) == "assistant"), None)
+        await deliver("done", {"agent": session.agent.name, "content": reply,
+                               "tool_cache_hits": response.tool_cache_hits})
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.session_ttl))
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id, session in list(self.sessions.items()):
+                if session.last_active < cutoff and not session.lock.locked():
+                    del self.sessions[session_id]
+
+    # --- HTTP ---
+
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _stream_turn(self, reader, writer, session, content):
+        # the disconnect probe below may read into the next request, so the
+        # connection is not reused after a stream
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        async def send(event, data):
+            payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+            writer.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            await writer.drain()
+
+        # the client sends nothing while the stream is open, so reading ends only when it leaves
+        disconnected = asyncio.ensure_future(reader.read(1))
+        try:
+            async with session.lock:
+                await self.run_turn(session, content, send, disconnected)
+        finally:
+            if not disconnected.done():
+                disconnected.cancel()
+            try:
+                await disconnected
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True  # close the connection
+
+    async def _dispatch(self, method, path, body, reader, writer):
+        if path == "/health" and method == "GET":
+            busy = sum(1 for session in self.sessions.values() if session.lock.locked())
+            return await self._send_json(writer, 200, {"sessions": len(self.sessions), "busy": busy})
+
+        match = _ROUTE.match(path)
+        if match is None:
+            return await self._send_json(writer, 404, {"error": f"Unknown path {path}"})
+        session_id, action = match.groups()
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return await self._send_json(writer, 400, {"error": "Invalid JSON body"})
+
+        if session_id is None:
+            if method != "POST":
+                return await self._send_json(writer, 405, {"error": "Use POST /sessions"})
+            if len(self.sessions) >= self.max_sessions:
+                return await self._send_json(writer, 503, {"error": "Too many sessions"})
+            try:
+                session = self.create_session(payload.get("agent", "triage"))
+            except KeyError:
+                return await self._send_json(writer, 400, {"error": f"Unknown agent; choose from {sorted(AGENTS)}"})
+            return await self._send_json(writer, 201, session.describe())
+
+        if session_id not in self.sessions and len(self.sessions) >= self.max_sessions:
+            return await self._send_json(writer, 503, {"error": "Too many sessions"})
+        session = self.get_session(session_id)  # a short log read when resuming
+        if session is None:
+            return await self._send_json(writer, 404, {"error": "No such session"})
+        session.last_active = time.monotonic()
+
+        if action is None:
+            if method == "GET":
+                return await self._send_json(writer, 200, session.describe())
+            if method == "DELETE":
+                if session.lock.locked():  # the turn would go on writing to its log
+                    return await self._send_json(writer, 409, {"error": "A turn is already running"})
+                del self.sessions[session_id]
+                tool_cache.get_tool_cache().clear(session_id)
+                if self.store is not None:
+                    self.store.delete(session_id)
+                return await self._send_json(writer, 200, {"deleted": session_id})
+            return await self._send_json(writer, 405, {"error": "Use GET or DELETE"})
+
+        if method != "POST":
+            return await self._send_json(writer, 405, {"error": "Use POST"})
+        if action == "answers":
+            answer = session.questions.get(payload.get("id"))
+            if answer is None or answer.done():
+                return await self._send_json(writer, 404, {"error": "No such question"})
+            answer.set_result(str(payload.get("answer", "")))
+            return await self._send_json(writer, 200, {"ok": True})
+
+        content = payload.get("content")
+        if not isinstance(content, str) or not content:
+            return await self._send_json(writer, 400, {"error": "Missing content"})
+        if session.lock.locked():
+            return await self._send_json(writer, 409, {"error": "A turn is already running"})
+        return await self._stream_turn(reader, writer, session, content)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:  # keep-alive: one request after another
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                close = await self._dispatch(method, target.split("?", 1)[0], body, reader, writer)
+                if close or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8090):
+        """
+        Start listening.
+
+        Returns:
+            int: The bound port (useful with port=0)
+        """
+        self._server = await asyncio.start_server(self._handle, host, port, limit=2 ** 20)
+        self._sweeper = asyncio.ensure_future(self._sweep())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host="127.0.0.1", port=8090):
+        port = await self.start(host, port)
+        print(f"Agent server on http://{host}:{port} ({len(AGENTS)} agents, Ctrl+C to stop)")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening and drop every session."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.shutdown(wait=False)
+        self.sessions.clear()
+
+
+# --- Terminal client ---
+
+def _post(url, payload, stream=False):
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    connection.request("POST", parts.path, json.dumps(payload), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    if stream and response.status == 200:
+        return response
+    body = json.loads(response.read() or b"{}")
+    connection.close()
+    if response.status >= 400:
+        raise RuntimeError(body.get("error", response.reason))
+    return body
+
+
+def _events(response):
+    """(event, data) pairs from a server-sent event stream."""
+    event = data = None
+    for raw in response:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+        elif not line and event is not None:
+            yield event, data
+            event = data = None
+
+
+def chat(base_url, agent="triage"):
+    """
+    Talk to an agent on a running server from the terminal.
+
+    Args:
+        base_url (str): Server URL, e.g. http://127.0.0.1:8090
+        agent (str): Key of AGENTS to start with
+    """
+    base_url = base_url.rstrip("/")
+    session = _post(f"{base_url}/sessions", {"agent": agent})
+    session_url = f"{base_url}/sessions/{session['session_id']}"
+    print(f"Session {session['session_id']} with {session['agent']} (Ctrl+C to quit)")
+
+    while True:
+        user = input("User: ")
+        response = _post(f"{session_url}/messages", {"content": user}, stream=True)
+        if isinstance(response, dict):
+            print(f"Error: {response}")
+            continue
+        line_open = False
+        for event, data in _events(response):
+            if event == "delta":
+                if not line_open:
+                    print("Agent: ", end="")
+                    line_open = True
+                print(data["text"], end="", flush=True)
+            elif event == "ask":
+                if line_open:
+                    print()
+                    line_open = False
+                _post(f"{session_url}/answers", {"id": data["id"], "answer": input(data["prompt"])})
+            elif event == "error":
+                print(f"\nError: {data['message']}")
+            elif event == "done" and line_open:
+                print()
+        response.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-session agent server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--workers', type=int, default=256, help='Turns that can run at once')
+    parser.add_argument('--chat', metavar='URL', help='Chat with a running server instead of serving')
+    parser.add_argument('--agent', default='triage', choices=sorted(AGENTS), help='Agent to start with (--chat)')
+    parser.add_argument('--sessions-dir', help='Where session logs are kept')
+    parser.add_argument('--no-store', action='store_true', help='Keep sessions in memory only')
+    args = parser.parse_args()
+
+    if args.chat:
+        try:
+            chat(args.chat, args.agent)
+        except (KeyboardInterrupt, EOFError):
+            print()
+        return
+
+    try:
+        store = None if args.no_store else SessionStore(args.sessions_dir)
+        asyncio.run(AgentServer(workers=args.workers, store=store).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmarks for the agent runtime in openai_agents.py.
+
+Usage:
+    python bench_agents.py [--iterations N] [--messages N]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import openai_agents
+from message_store import Message, SessionStore
+
+
+def rebuild_tools(agent):
+    """Per-iteration tool setup as run_full_turn did it before compiled_tools()."""
+    tool_schemas = [openai_agents.function_to_schema(tool) for tool in agent.tools]
+    tools_map = {tool.__name__: tool for tool in agent.tools}
+    return tool_schemas, tools_map
+
+
+def bench_tool_setup(iterations):
+    """
+    Compare rebuilding tool schemas every loop iteration with the per-agent cache.
+
+    Args:
+        iterations (int): Loop iterations to time per agent
+    """
+    agents = [
+        openai_agents.triage_agent,
+        openai_agents.sales_agent,
+        openai_agents.issues_and_repairs_agent,
+    ]
+
+    print(f"Tool setup per run_full_turn iteration ({iterations} iterations)")
+    print(f"{'agent':<28}{'rebuild (us)':>14}{'cached (us)':>14}{'speedup':>10}")
+    for agent in agents:
+        # also check the cached schemas match a fresh build
+        assert agent.compiled_tools()[0] == rebuild_tools(agent)[0]
+
+        rebuild = timeit.timeit(lambda: rebuild_tools(agent), number=iterations)
+        cached = timeit.timeit(agent.compiled_tools, number=iterations)
+        print(
+            f"{agent.name:<28}{rebuild / iterations * 1e6:>14.2f}"
+            f"{cached / iterations * 1e6:>14.2f}{rebuild / cached:>9.1f}x"
+        )
+
+
+def synthetic_turn(i):
+    """One turn with a tool call, as the API returns it: SDK assistant messages, dict results."""
+    from openai.types.chat import ChatCompletionMessage
+
+    call_id = f"call_{i:012d}"
+    return [
+        {"role": "user", "content": f"Where is my order {i}? It was supposed to arrive on Monday."},
+        ChatCompletionMessage.model_validate({
+            "role": "assistant", "content": None,
+            "tool_calls": [{"id": call_id, "type": "function", "function": {
+                "name": "look_up_item", "arguments": json.dumps({"search_query": f"order {i}"})}}],
+        }),
+        {"role": "tool", "tool_call_id": call_id, "content": f"item_{i:09d}"},
+        ChatCompletionMessage.model_validate({
+            "role": "assistant", "content": f"Order {i} shipped yesterday and arrives tomorrow.",
+        }),
+    ]
+
+
+def allocated(build):
+    """Bytes still allocated by what build() returns."""
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def bench_session_history(count):
+    """
+    Compare a history of SDK messages with message_store.Message, and time
+    writing and resuming its session log.
+
+    Args:
+        count (int): Messages in the history (four per turn)
+    """
+    turns = range(count // 4)
+    sdk = allocated(lambda: [message for i in turns for message in synthetic_turn(i)])
+    compact = allocated(lambda: [Message.from_any(message) for i in turns for message in synthetic_turn(i)])
+    print(f"Session history memory ({len(turns) * 4} messages)")
+    print(f"{'SDK objects and dicts':<28}{sdk / 2**20:>10.2f} MB")
+    print(f"{'Message':<28}{compact / 2**20:>10.2f} MB{sdk / compact:>9.1f}x smaller")
+
+    messages = [Message.from_any(message) for i in turns for message in synthetic_turn(i)]
+    directory = tempfile.mkdtemp()
+    try:
+        store = SessionStore(directory)
+        started = time.perf_counter()
+        for start in range(0, len(messages), 4):
+            store.append("bench", messages[start:start + 4])
+        written = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loaded, _ = store.load("bench")
+        load = time.perf_counter() - started
+        assert loaded == messages
+
+        size = sum(len(line) for line in open(store.path("bench"), "rb"))
+        print(f"Session log: {size / 2**20:.2f} MB, append {written / len(turns) * 1e6:.0f} us/turn, "
+              f"load {load * 1e3:.1f} ms ({len(messages) / load:,.0f} messages/s)")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agent runtime micro-benchmarks')
+    parser.add_argument('--iterations', type=int, default=20000, help='Iterations per measurement')
+    parser.add_argument('--messages', type=int, default=20000, help='Session history length')
+    args = parser.parse_args()
+
+    bench_tool_setup(args.iterations)
+    print()
+    bench_session_history(args.messages)
+
+
+if __name__ == '__main__':
+    main()
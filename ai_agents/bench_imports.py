@@ -0,0 +1,95 @@
+"""
+Import-time benchmark for the ai_agents modules, based on `python -X importtime`.
+
+Each module is imported in a fresh interpreter. The report shows the median
+cumulative import time and the slowest imports beneath it. The run fails if
+a module pulls in a heavy dependency at import time or exceeds --max-ms.
+
+Usage:
+    python bench_imports.py [--repeat N] [--top N] [--max-ms MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = ["llm_utils", "openai_agents"]
+
+# Dependencies that must only load on first use, never at import time
+DEFERRED = ["openai", "httpx", "rich", "dotenv", "asyncio"]
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Module name, importable from this directory
+
+    Returns:
+        tuple: (cumulative_us, [(cumulative_us, name), ...] for imports under it,
+        deferred dependencies that were loaded anyway)
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+
+    # Children are reported before their parent, so the module's subtree is
+    # the run of indented lines right before its own top-level line.
+    subtree = []
+    total = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        if name.startswith("  "):
+            subtree.append((int(cumulative), name.strip()))
+        elif name.strip() == module:
+            total = int(cumulative)
+            break
+        else:
+            subtree = []
+
+    leaked = [m for m in proc.stdout.strip().split(",") if m]
+    return total, sorted(subtree, reverse=True), leaked
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark for ai_agents')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=5, help='Slowest nested imports to list')
+    parser.add_argument('--max-ms', type=float, help='Fail if a module takes longer than this')
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(run[0] for run in runs) / 1000
+        _, slowest, leaked = runs[-1]
+
+        print(f"{module}: {median_ms:.1f} ms (median of {args.repeat})")
+        for cumulative, name in slowest[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+        if leaked:
+            print(f"  FAIL: imported at import time: {', '.join(leaked)}")
+            failed = True
+        if args.max_ms is not None and median_ms > args.max_ms:
+            print(f"  FAIL: over the {args.max_ms:.1f} ms budget")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Offline load benchmark for the LLM layer, run against stub_llm_server.
+
+Points llm_utils.openai_client, llm_utils.perplexity_client and
+openai_agents.client (and, through the environment, any client created
+later, async ones included) at the stub, then drives a scenario and reports
+throughput, latency percentiles and time to first token.
+
+Usage:
+    python bench_llm.py [--scenario openai] [--requests 200] [--concurrency 8]
+        [--latency lognormal:0.05,0.5] [--error-rate 0.0] [--url http://host:port/v1]
+        [--distinct N] [--hedge [PERCENTILE]]
+
+Scenarios: openai, openai-stream, perplexity, perplexity-stream, batch, agent, agent-stream
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_llm_server import StubBehavior, start_stub_server
+
+SCENARIOS = ("openai", "openai-stream", "perplexity", "perplexity-stream", "batch", "agent", "agent-stream")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def point_clients_at(base_url):
+    """
+    Route every LLM client at base_url.
+
+    Args:
+        base_url (str): Stub URL ending in /v1
+    """
+    # Clients created from now on (including per-loop async clients) read these
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["PERPLEXITY_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("PERPLEXITY_API_KEY", "stub")
+
+    import llm_utils
+    import openai_agents
+    from llm_clients import create_openai_client, create_perplexity_client
+
+    llm_utils.openai_client = create_openai_client()
+    llm_utils.perplexity_client = create_perplexity_client()
+    llm_utils._async_clients.clear()
+    openai_agents.client = llm_utils.openai_client
+
+
+def _timed(call):
+    """Run call() -> (ok, first_token_time or None); return (ok, latency, ttft)."""
+    started = time.perf_counter()
+    try:
+        ok, first = call()
+    except Exception:
+        ok, first = False, None
+    finished = time.perf_counter()
+    return ok, finished - started, (first - started) if first is not None else None
+
+
+def _openai_request(i, hedge=None):
+    import llm_utils
+
+    success, _ = llm_utils.get_llm_completion(f"Question {i}", "gpt-4o", use_cache=False, hedge=hedge)
+    return success, None
+
+
+def _openai_stream_request(i):
+    import llm_utils
+
+    success, response = llm_utils.get_llm_completion(f"Question {i}", "gpt-4o", stream=True)
+    if not success:
+        return False, None
+    first = None
+    for _ in llm_utils.iter_stream_text(response):
+        if first is None:
+            first = time.perf_counter()
+    return True, first
+
+
+def _perplexity_request(i):
+    import llm_utils
+
+    response = llm_utils.get_perplexity_completion(f"Question {i}", use_cache=False)
+    return response is not None, None
+
+
+def _perplexity_stream_request(i):
+    import llm_utils
+
+    response = llm_utils.get_perplexity_completion(f"Question {i}", stream=True, use_cache=False)
+    if response is None:
+        return False, None
+    first = None
+    for chunk in response:
+        if first is None and chunk.choices and chunk.choices[0].delta.content:
+            first = time.perf_counter()
+    return True, first
+
+
+def _agent_request(i, stream=False):
+    import openai_agents
+
+    first = []
+
+    def on_delta(text):
+        if not first:
+            first.append(time.perf_counter())
+
+    response = openai_agents.run_full_turn(
+        openai_agents.issues_and_repairs_agent,
+        [{"role": "user", "content": f"My anvil number {i} is broken"}],
+        stream=stream, on_delta=on_delta,
+    )
+    return bool(response.messages), first[0] if first else None
+
+
+def run_scenario(scenario, requests, concurrency, distinct=None, hedge=None):
+    """
+    Drive one scenario.
+
+    Args:
+        scenario (str): One of SCENARIOS
+        requests (int): Total requests
+        concurrency (int): Requests in flight at once
+        distinct (int, optional): Cycle over this many different prompts, so
+            identical requests overlap; None makes every prompt unique
+        hedge (HedgePolicy, optional): Hedge the openai scenario's requests
+
+    Returns:
+        dict: requests, errors, elapsed, throughput, latency and ttft lists
+    """
+    if distinct:
+        prompts = [i % distinct for i in range(requests)]
+    else:
+        prompts = list(range(requests))
+
+    if scenario == "batch":
+        import llm_utils
+
+        started = time.perf_counter()
+        results = llm_utils.batch_llm_completion(
+            [f"Question {i}" for i in prompts], "gpt-4o",
+            max_concurrency=concurrency, use_cache=False
+        )
+        elapsed = time.perf_counter() - started
+        return {
+            "requests": requests,
+            "errors": sum(1 for success, _ in results if not success),
+            "elapsed": elapsed,
+            "latencies": [],
+            "ttfts": [],
+        }
+
+    call = {
+        "openai": lambda i: _openai_request(i, hedge),
+        "openai-stream": _openai_stream_request,
+        "perplexity": _perplexity_request,
+        "perplexity-stream": _perplexity_stream_request,
+        "agent": _agent_request,
+        "agent-stream": lambda i: _agent_request(i, stream=True),
+    }[scenario]
+
+    # tools and agents print as they go; keep that out of the report
+    quiet = contextlib.redirect_stdout(io.StringIO()) if scenario.startswith("agent") else contextlib.nullcontext()
+    started = time.perf_counter()
+    with quiet, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: _timed(lambda: call(i)), prompts))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": sum(1 for ok, _, _ in results if not ok),
+        "elapsed": elapsed,
+        "latencies": [latency for ok, latency, _ in results if ok],
+        "ttfts": [ttft for ok, _, ttft in results if ok and ttft is not None],
+    }
+
+
+def print_report(scenario, result):
+    """Print throughput, latency percentiles, time to first token, upstream savings and hedging for a run."""
+    from hedging import get_hedge_policy
+    from single_flight import get_coalescer
+
+    def ms(value):
+        return f"{value * 1000:8.1f}" if value is not None else f"{'-':>8}"
+
+    print(f"scenario     {scenario}")
+    print(f"requests     {result['requests']} ({result['errors']} errors) in {result['elapsed']:.2f}s")
+    print(f"throughput   {result['requests'] / result['elapsed']:.1f} req/s")
+    print(f"{'':13}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}")
+    for label, values in (("latency", result["latencies"]), ("ttft", result["ttfts"])):
+        print(f"{label:<13}" + "".join(ms(percentile(values, p)) for p in (0.50, 0.95, 0.99)))
+    flights = get_coalescer().stats()
+    print(f"coalesced    {flights['coalesced']} of {flights['calls']} calls shared an in-flight request")
+    for model, hedges in get_hedge_policy().stats().items():
+        if hedges["requests"]:
+            print(f"hedged       {model}: {hedges['hedged']} of {hedges['requests']} requests after "
+                  f"{hedges['delay'] * 1000:.0f} ms, backup won {hedges['backup_wins']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM layer load benchmark against a local stub')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='openai')
+    parser.add_argument('--requests', type=int, default=200, help='Total requests')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+    parser.add_argument('--distinct', type=int, help='Number of different prompts (default: all unique)')
+    parser.add_argument('--hedge', type=float, nargs='?', const=0.95, metavar='PERCENTILE',
+                        help='Hedge openai requests slower than this latency percentile (default 0.95)')
+    parser.add_argument('--url', help='Use an already running stub instead of starting one')
+    parser.add_argument('--latency', default='lognormal:0.05,0.5', help='Stub time to first token')
+    parser.add_argument('--chunks', type=int, default=10, help='Stub content chunks per reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.005, help='Stub seconds between chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Stub fraction of failed requests')
+    parser.add_argument('--seed', type=int, default=0, help='Stub random seed')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        behavior = StubBehavior(
+            latency=args.latency, chunks=args.chunks, chunk_delay=args.chunk_delay,
+            error_rate=args.error_rate, seed=args.seed,
+            tool_calls=[("look_up_item", {"search_query": "anvil"})],
+        )
+        server, base_url = start_stub_server(behavior)
+
+    hedge = None
+    if args.hedge is not None:
+        import hedging
+
+        # same-model backups, so the stub's latency distribution is all that differs
+        hedge = hedging.hedge_policy = hedging.HedgePolicy(percentile=args.hedge, backups={})
+
+    point_clients_at(base_url)
+    try:
+        print_report(args.scenario, run_scenario(args.scenario, args.requests, args.concurrency,
+                                                 args.distinct, hedge))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
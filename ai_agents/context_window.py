@@ -0,0 +1,237 @@
+import hashlib
+import json
+
+# Prompt budgets in tokens. These are deliberately far below the models'
+# context limits: they cap per-turn latency and cost, not what fits.
+MODEL_BUDGETS = {
+    "gpt-4o": 16000,
+    "gpt-4o-mini": 16000,
+    "o1-preview": 16000,
+    "o1-mini": 16000,
+    "sonar-pro": 8000,
+    "sonar": 8000,
+}
+DEFAULT_BUDGET = 8000
+
+# Fixed per-message cost of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+# Models that reject system messages; the summary goes to them as a user message
+NO_SYSTEM_ROLE = ("o1-preview", "o1-mini")
+
+
+def _field(message, name):
+    """Read a field from a message dict or an SDK message object."""
+    if isinstance(message, dict):
+        return message.get(name)
+    return getattr(message, name, None)
+
+
+def _tool_calls(message):
+    """Tool calls of a message as plain dictionaries."""
+    calls = _field(message, "tool_calls") or []
+    return [
+        call if isinstance(call, dict) else {
+            "id": call.id,
+            "name": call.function.name,
+            "arguments": call.function.arguments,
+        }
+        for call in calls
+    ]
+
+
+def estimate_tokens(message):
+    """
+    Estimate the prompt tokens a message costs, without a tokenizer.
+
+    Uses the usual ~4 characters per token rule for English text.
+
+    Args:
+        message (dict or object): Chat message
+
+    Returns:
+        int: Estimated token count
+    """
+    chars = len(_field(message, "content") or "")
+    for call in _tool_calls(message):
+        chars += len(json.dumps(call))
+    return MESSAGE_OVERHEAD + (chars + 3) // 4
+
+
+def group_turns(messages):
+    """
+    Split messages into units that must be kept or dropped together.
+
+    An assistant message with tool calls and the tool results that follow it
+    form one unit, so a tool call is never separated from its result.
+
+    Args:
+        messages (list): Chat messages
+
+    Returns:
+        list: Lists of messages
+    """
+    units = []
+    for message in messages:
+        if _field(message, "role") == "tool" and units:
+            units[-1].append(message)
+        else:
+            units.append([message])
+    return units
+
+
+def _digest(units):
+    hasher = hashlib.sha256()
+    for unit in units:
+        for message in unit:
+            record = {
+                "role": _field(message, "role"),
+                "content": _field(message, "content"),
+                "tool_calls": _tool_calls(message),
+                "tool_call_id": _field(message, "tool_call_id"),
+            }
+            hasher.update(json.dumps(record, sort_keys=True, default=str).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def summary_prompt(previous_summary, messages):
+    """
+    Build the prompt a summarizer sends to fold messages into a running summary.
+
+    Args:
+        previous_summary (str or None): Summary of turns compacted earlier
+        messages (list): Turns being compacted now
+
+    Returns:
+        str: Prompt text
+    """
+    lines = []
+    for message in messages:
+        content = _field(message, "content")
+        calls = _tool_calls(message)
+        if content:
+            lines.append(f"{_field(message, 'role')}: {content}")
+        for call in calls:
+            lines.append(f"{_field(message, 'role')} called {call['name']}({call['arguments']})")
+
+    prompt = (
+        "Summarize this conversation in a few sentences. Keep names, IDs, "
+        "decisions and open questions.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Summary so far: {previous_summary}\n\n"
+    return prompt + "\n".join(lines)
+
+
+class ContextWindow:
+    """
+    Keeps the prompt for a growing chat history within a per-model token budget.
+
+    Leading system messages and the most recent turns are sent verbatim. When the
+    history no longer fits, older turns are compacted down to low_watermark of
+    the budget, either by dropping them ("truncate") or by folding them into a
+    running summary ("summarize"). The compaction point is sticky, so the
+    summarizer runs occasionally rather than on every turn. If the summarizer
+    raises, the turns are dropped as with "truncate" and the summary keeps
+    what it already covered.
+    """
+
+    def __init__(self, budgets=None, strategy="truncate", summarizer=None,
+                 keep_recent=4, low_watermark=0.6):
+        """
+        Args:
+            budgets (dict, optional): Model -> token budget, merged over MODEL_BUDGETS
+            strategy (str): "truncate" or "summarize"
+            summarizer (callable, optional): summarizer(previous_summary, messages) -> str,
+                required for the "summarize" strategy
+            keep_recent (int): Most recent turns that are never compacted
+            low_watermark (float): Fraction of the budget to compact down to
+        """
+        if strategy not in ("truncate", "summarize"):
+            raise ValueError(f"Unknown context strategy: {strategy}")
+        if strategy == "summarize" and summarizer is None:
+            raise ValueError("The summarize strategy needs a summarizer")
+
+        self.budgets = dict(MODEL_BUDGETS, **(budgets or {}))
+        self.strategy = strategy
+        self.summarizer = summarizer
+        self.keep_recent = keep_recent
+        self.low_watermark = low_watermark
+
+        # (units compacted, digest of those units, summary text or None,
+        #  units the summary covers; the rest of the compacted ones were dropped)
+        self._compacted = (0, _digest([]), None, 0)
+
+    def budget_for(self, model):
+        """Token budget for a model."""
+        return self.budgets.get(model, DEFAULT_BUDGET)
+
+    def fit(self, messages, model, system_role=None, reserved=0):
+        """
+        Return the messages to send for the next request.
+
+        Args:
+            messages (list): Full conversation history (not modified)
+            model (str): Model the request goes to
+            system_role (bool, optional): Whether system messages reach the
+                model; defaults to every model but NO_SYSTEM_ROLE. If not, the
+                summary (or omitted-messages note) is sent with the user role
+            reserved (int): Tokens the request spends besides these messages,
+                e.g. an agent's instructions and tool schemas
+
+        Returns:
+            list: Pinned system messages, an optional summary, then recent turns
+        """
+        pinned = []
+        for message in messages:
+            if _field(message, "role") != "system":
+                break
+            pinned.append(message)
+        units = group_turns(messages[len(pinned):])
+        costs = [sum(estimate_tokens(m) for m in unit) for unit in units]
+
+        budget = self.budget_for(model) - reserved - sum(estimate_tokens(m) for m in pinned)
+
+        # Reuse the previous compaction point if the history still starts the same way
+        start, digest, summary, summarized = self._compacted
+        if start > len(units) or _digest(units[:start]) != digest:
+            start, summary, summarized = 0, None, 0
+
+        summary_cost = estimate_tokens({"content": summary}) if summary else 0
+        if summary_cost + sum(costs[start:]) > budget:
+            target = budget * self.low_watermark
+            cut = start
+            remaining = sum(costs[cut:])
+            while len(units) - cut > self.keep_recent and remaining > target:
+                remaining -= costs[cut]
+                cut += 1
+
+            if cut > start:
+                if self.strategy == "summarize":
+                    dropped = [m for unit in units[start:cut] for m in unit]
+                    try:
+                        summary = self.summarizer(summary, dropped)
+                        summarized = cut
+                    except Exception:
+                        pass  # truncate instead; a failed summary mustn't fail the request
+                start = cut
+                self._compacted = (start, _digest(units[:start]), summary, summarized)
+
+        if system_role is None:
+            system_role = model not in NO_SYSTEM_ROLE
+        note_role = "system" if system_role else "user"
+        window = list(pinned)
+        omitted = sum(len(unit) for unit in units[summarized:start])
+        if summary:
+            content = f"Summary of the earlier conversation: {summary}"
+            if omitted:
+                content += f"\n[{omitted} later messages omitted]"
+            window.append({"role": note_role, "content": content})
+        elif omitted:
+            window.append({
+                "role": note_role,
+                "content": f"[{omitted} earlier messages omitted]",
+            })
+        for unit in units[start:]:
+            window.extend(unit)
+        return window
@@ -0,0 +1,247 @@
+"""
+Hedged LLM requests.
+
+A hedged request goes to the primary model first. If it has not answered
+once it has taken longer than a percentile of that model's recent
+latencies, a backup request goes to a second model (or to the same model
+again). The first successful answer wins and the other request is
+cancelled. The policy keeps a rolling latency histogram per model and
+counts how often it hedged and how often the backup won. Only successful
+requests (and cancelled losers, see HedgePolicy._timed) feed the histogram:
+errors often return fast and would make it hedge too early.
+"""
+import bisect
+import collections
+import math
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds: 10ms to about 5 minutes, 20% apart
+_BOUNDS = tuple(0.01 * 1.2 ** i for i in range(58))
+
+# Backup model for each primary; models not listed are hedged with a second
+# request to the same model
+DEFAULT_BACKUPS = {
+    "gpt-4o": "gpt-4o-mini",
+    "sonar-pro": "sonar",
+}
+
+
+class LatencyHistogram:
+    """
+    Latencies of a model's most recent requests, on log-spaced buckets.
+
+    Args:
+        window (int): Number of recent requests covered
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self.counts = [0] * len(_BOUNDS)
+        self.recent = collections.deque()  # bucket of each request in the window
+
+    def __len__(self):
+        return len(self.recent)
+
+    def add(self, seconds):
+        """Record one request's latency, dropping the oldest once the window is full."""
+        bucket = min(bisect.bisect_left(_BOUNDS, seconds), len(_BOUNDS) - 1)
+        if len(self.recent) == self.window:
+            self.counts[self.recent.popleft()] -= 1
+        self.recent.append(bucket)
+        self.counts[bucket] += 1
+
+    def percentile(self, fraction):
+        """
+        Latency below which `fraction` of the recent requests finished.
+
+        Args:
+            fraction (float): e.g. 0.95
+
+        Returns:
+            float or None: Upper bound of the bucket holding that rank, in
+            seconds (None with no data)
+        """
+        if not self.recent:
+            return None
+        rank = max(1, math.ceil(fraction * len(self.recent)))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return _BOUNDS[bucket]
+        return _BOUNDS[-1]
+
+
+class HedgePolicy:
+    """
+    When and where to send backup requests.
+
+    Args:
+        percentile (float): Hedge once the primary has run longer than this
+            fraction of its model's recent requests
+        backups (dict, optional): primary model -> backup model; defaults to
+            DEFAULT_BACKUPS
+        min_samples (int): Latencies needed before the percentile is trusted
+        initial_delay (float): Seconds to wait before hedging until then
+        min_delay (float): Never hedge sooner than this many seconds
+        window (int): Recent requests per model kept in its histogram
+    """
+
+    def __init__(self, percentile=0.95, backups=None, min_samples=20, initial_delay=2.0,
+                 min_delay=0.05, window=500):
+        self.percentile = percentile
+        self.backups = DEFAULT_BACKUPS if backups is None else backups
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counts = {}  # model -> {"requests", "hedged", "backup_wins"}
+
+    def backup_for(self, model):
+        """Model that receives the backup request for `model`."""
+        return self.backups.get(model, model)
+
+    def _histogram(self, model):
+        histogram = self._histograms.get(model)
+        if histogram is None:
+            histogram = self._histograms[model] = LatencyHistogram(self.window)
+        return histogram
+
+    def _count(self, model, name):
+        counts = self._counts.setdefault(model, {"requests": 0, "hedged": 0, "backup_wins": 0})
+        counts[name] += 1
+
+    def delay(self, model):
+        """Seconds a request to `model` may run before it is hedged."""
+        with self._lock:
+            histogram = self._histogram(model)
+            if len(histogram) < self.min_samples:
+                return self.initial_delay
+            return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def record(self, model, seconds):
+        """Add a successful request's latency to the model's histogram."""
+        with self._lock:
+            self._histogram(model).add(seconds)
+
+    async def _timed(self, model, request):
+        import asyncio
+
+        started = time.monotonic()
+        try:
+            result = await request
+        except asyncio.CancelledError:
+            # A cancelled loser is recorded at the time it had run, a lower
+            # bound, so slow requests keep the percentile from drifting down
+            self.record(model, time.monotonic() - started)
+            raise
+        except Exception as e:
+            return False, str(e)
+        if result[0]:
+            self.record(model, time.monotonic() - started)
+        return result
+
+    async def run(self, model, attempt):
+        """
+        Make a request, hedging it if the primary is slow.
+
+        Args:
+            model (str): Primary model
+            attempt (callable): attempt(model, backup) returns an awaitable
+                resolving to (success, response/error_message)
+
+        Returns:
+            tuple: (success, response/error_message) of the first successful
+            request, or of the primary if both failed
+        """
+        import asyncio
+
+        delay = self.delay(model)
+        with self._lock:
+            self._count(model, "requests")
+
+        tasks = []
+
+        def cancel_losers(task):
+            # runs as soon as a request finishes, before run() gets to see it,
+            # so a loser isn't left running (and billed) for another loop step
+            if task.cancelled() or task.exception() is not None or not task.result()[0]:
+                return
+            for other in tasks:
+                if other is not task and not other.done():
+                    other.cancel()
+
+        primary = asyncio.ensure_future(self._timed(model, attempt(model, False)))
+        primary.add_done_callback(cancel_losers)
+        tasks.append(primary)
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            backup_model = self.backup_for(model)
+            with self._lock:
+                self._count(model, "hedged")
+            backup = asyncio.ensure_future(self._timed(backup_model, attempt(backup_model, True)))
+            backup.add_done_callback(cancel_losers)
+            tasks.append(backup)
+
+            pending = set(tasks)
+            failed = {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # both can finish in the same step; the primary's answer is preferred
+                for task in sorted(done, key=lambda task: task is not primary):
+                    if task.cancelled():  # the other one already won
+                        continue
+                    success, response = task.result()
+                    if success:
+                        if task is backup:
+                            with self._lock:
+                                self._count(model, "backup_wins")
+                        return success, response
+                    failed[task] = (success, response)
+            return failed.get(primary) or failed[backup]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        """
+        Report hedging per primary model.
+
+        Returns:
+            dict: model -> requests, hedged, backup_wins, p50, p95 and the
+            current hedge delay (latencies in seconds)
+        """
+        with self._lock:
+            models = set(self._counts) | set(self._histograms)
+            report = {}
+            for model in sorted(models):
+                histogram = self._histogram(model)
+                counts = self._counts.get(model, {"requests": 0, "hedged": 0, "backup_wins": 0})
+                enough = len(histogram) >= self.min_samples
+                report[model] = dict(
+                    counts,
+                    p50=histogram.percentile(0.50),
+                    p95=histogram.percentile(0.95),
+                    delay=max(self.min_delay, histogram.percentile(self.percentile))
+                    if enough else self.initial_delay,
+                )
+            return report
+
+
+hedge_policy = None
+
+
+def get_hedge_policy():
+    """Return the process-wide HedgePolicy, creating it on first use."""
+    global hedge_policy
+    if hedge_policy is None:
+        hedge_policy = HedgePolicy()
+    return hedge_policy
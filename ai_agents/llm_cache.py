@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "suits_llm", "responses.sqlite3"
+)
+
+# Only these message fields affect what the model sees
+_MESSAGE_FIELDS = ("role", "content", "name", "tool_calls", "tool_call_id")
+
+
+def _normalize_messages(messages):
+    """Reduce a query or message list to plain, comparable dictionaries."""
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return [
+        {field: msg[field] for field in _MESSAGE_FIELDS if msg.get(field) is not None}
+        for msg in messages
+    ]
+
+
+def make_cache_key(model, messages, **params):
+    """
+    Build a stable content hash for a chat completion request.
+
+    Args:
+        model (str): Model identifier
+        messages (list or str): Message list or a single string query
+        **params: Any other request parameters that change the output (e.g. temperature)
+
+    Returns:
+        str: Hex SHA-256 digest of the normalized request
+    """
+    payload = {
+        "model": model,
+        "messages": _normalize_messages(messages),
+        "params": params,
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: a small in-memory LRU in front of a SQLite file.
+
+    Entries expire after ttl seconds. When the file grows past max_bytes the
+    least recently used entries are evicted. Safe to share between threads,
+    and between processes using the same file.
+    """
+
+    # Memory-tier hits are written to last_access in batches of this many,
+    # or after this many seconds
+    TOUCH_BATCH = 64
+    TOUCH_INTERVAL = 5.0
+
+    # Writes between recounts of the file's size (other processes add to it too)
+    RECOUNT_EVERY = 100
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600,
+                 max_bytes=64 * 1024 * 1024, memory_entries=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "evictions": 0}
+        self._touched = {}  # key -> time of memory hits not yet in last_access
+        self._touches_flushed = time.monotonic()
+        self._writes = 0
+
+        import sqlite3  # deferred: only needed once a cache is actually opened
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._total_bytes = self._disk_bytes()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key from make_cache_key
+
+        Returns:
+            str or None: Cached value, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                # the disk LRU must see this access too, or it evicts the hottest entries first
+                self._touched[key] = now
+                if (len(self._touched) >= self.TOUCH_BATCH
+                        or time.monotonic() - self._touches_flushed >= self.TOUCH_INTERVAL):
+                    self._flush_touches()
+                return entry[0]
+
+            row = self._db.execute(
+                "SELECT value, created, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl <= now:
+                if row is not None:
+                    self._delete(key, row[2])
+                self._memory.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._remember(key, row[0], row[1] + self.ttl)
+            self._stats["hits"] += 1
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Store a response, evicting least recently used entries if over max_bytes.
+
+        Args:
+            key (str): Key from make_cache_key
+            value (str): Serialized response
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            self._remember(key, value, now + self.ttl)
+            self._writes += 1
+            if self._total_bytes > self.max_bytes or self._writes % self.RECOUNT_EVERY == 0:
+                self._evict()
+
+    def clear(self):
+        """Drop every cached entry from both tiers."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._memory.clear()
+            self._touched.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: hits, misses, memory_hits, evictions, entries and bytes on disk
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return dict(self._stats, entries=entries, bytes=self._total_bytes)
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key, size):
+        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._total_bytes -= size
+
+    def flush(self):
+        """Write pending memory-tier access times to the file."""
+        with self._lock:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(when, key) for key, when in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touches_flushed = time.monotonic()
+
+    def _disk_bytes(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        # The running total misses what other processes wrote, so recount first
+        self._total_bytes = self._disk_bytes()
+        if self._total_bytes <= self.max_bytes:
+            return
+        self._flush_touches()
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        )
+        victims = []
+        excess = self._total_bytes - self.max_bytes
+        for key, size in rows:
+            if excess <= 0:
+                break
+            victims.append((key, size))
+            excess -= size
+        for key, size in victims:
+            self._delete(key, size)
+            self._memory.pop(key, None)
+            self._stats["evictions"] += 1
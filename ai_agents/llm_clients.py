@@ -0,0 +1,121 @@
+"""
+Lazy construction of the OpenAI and Perplexity API clients.
+
+Nothing here touches the network, the environment or the openai package
+until a client is first requested, so importing modules stays cheap.
+
+Blocking clients share one keep-alive connection pool, and the async clients
+of an event loop share another, so OpenAI and Perplexity calls reuse warm
+connections instead of reconnecting. The SDK's own retries are turned off;
+request_scheduler retries with rate-limit awareness instead.
+"""
+import os
+
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+# Connection pool tuning, overridable through the environment
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY = 60.0
+REQUEST_TIMEOUT = 120.0
+CONNECT_TIMEOUT = 5.0
+
+_env_loaded = False
+_http_client = None
+
+
+def load_env():
+    """Load .env into the environment once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def create_http_client(asynchronous=False):
+    """
+    Build a keep-alive HTTP connection pool for the API clients.
+
+    Sizes and timeouts come from LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE,
+    LLM_KEEPALIVE_EXPIRY and LLM_TIMEOUT when set.
+
+    Args:
+        asynchronous (bool): Build an async pool (bound to the event loop it is used on)
+
+    Returns:
+        The SDK's default sync or async httpx client class, with these limits
+    """
+    from openai import DefaultHttpxClient, DefaultAsyncHttpxClient
+    from openai._constants import DEFAULT_CONNECTION_LIMITS, DEFAULT_TIMEOUT
+
+    # Take Limits/Timeout from the HTTP library this SDK version is built on
+    Limits, Timeout = type(DEFAULT_CONNECTION_LIMITS), type(DEFAULT_TIMEOUT)
+    limits = Limits(
+        max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv('LLM_MAX_KEEPALIVE', MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=float(os.getenv('LLM_KEEPALIVE_EXPIRY', KEEPALIVE_EXPIRY)),
+    )
+    timeout = Timeout(float(os.getenv('LLM_TIMEOUT', REQUEST_TIMEOUT)), connect=CONNECT_TIMEOUT)
+    client_class = DefaultAsyncHttpxClient if asynchronous else DefaultHttpxClient
+    return client_class(limits=limits, timeout=timeout)
+
+
+def get_http_client():
+    """Return the blocking connection pool shared by every blocking client."""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def _client_options(asynchronous, http_client):
+    if http_client is None and not asynchronous:
+        http_client = get_http_client()
+    return {"http_client": http_client, "max_retries": 0}
+
+
+def create_openai_client(asynchronous=False, http_client=None):
+    """
+    Build an OpenAI API client.
+
+    Args:
+        asynchronous (bool): Return an AsyncOpenAI client instead of OpenAI
+        http_client (httpx.Client or httpx.AsyncClient, optional): Connection pool
+            to use. Blocking clients default to the shared pool; pass one from
+            create_http_client(asynchronous=True) to share it between async clients
+
+    Returns:
+        OpenAI or AsyncOpenAI client
+    """
+    load_env()
+    from openai import OpenAI, AsyncOpenAI
+
+    client_class = AsyncOpenAI if asynchronous else OpenAI
+    return client_class(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        **_client_options(asynchronous, http_client)
+    )
+
+
+def create_perplexity_client(asynchronous=False, http_client=None):
+    """
+    Build a Perplexity API client (OpenAI-compatible).
+
+    Args:
+        asynchronous (bool): Return an AsyncOpenAI client instead of OpenAI
+        http_client (httpx.Client or httpx.AsyncClient, optional): Connection pool
+            to use, as for create_openai_client
+
+    Returns:
+        OpenAI or AsyncOpenAI client pointed at the Perplexity API
+    """
+    load_env()
+    from openai import OpenAI, AsyncOpenAI
+
+    client_class = AsyncOpenAI if asynchronous else OpenAI
+    return client_class(
+        api_key=os.getenv('PERPLEXITY_API_KEY'),
+        base_url=os.getenv('PERPLEXITY_BASE_URL', PERPLEXITY_BASE_URL),
+        **_client_options(asynchronous, http_client)
+    )
@@ -1,44 +1,206 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-from rich.markdown import Markdown
-from rich.console import Console
+import contextvars
+import threading
+import weakref
 import os
 
-# Load environment variables
-load_dotenv()
+from llm_clients import create_openai_client, create_perplexity_client, create_http_client, load_env
+from request_scheduler import get_scheduler
+from single_flight import get_coalescer
+from hedging import get_hedge_policy
+from metrics import get_metrics
+from llm_cache import ResponseCache, make_cache_key, DEFAULT_CACHE_PATH
+from context_window import ContextWindow, summary_prompt
 
-# Initialize clients and console
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-perplexity_client = OpenAI(
-    api_key=os.getenv('PERPLEXITY_API_KEY'), 
-    base_url="https://api.perplexity.ai"
-)
-console = Console()
+# Clients are created on first use (see get_openai_client / get_perplexity_client)
+# so importing this module does no I/O. Assigning them directly overrides that.
+openai_client = None
+perplexity_client = None
 
-def get_openai_completion(messages, model="gpt-4o"):
+# Shared response cache, created on first use (set LLM_CACHE=off to disable)
+response_cache = None
+
+# Async clients hold connection pools bound to the event loop they were first
+# used on, so keep one pair per running loop (shared by every call on it).
+_async_clients = weakref.WeakKeyDictionary()
+
+# OpenAI streams end with a chunk carrying token usage, for metrics
+_STREAM_OPTIONS = {"include_usage": True}
+
+# Cleared inside hedge backups, which must not join the request they back up
+_coalescing = contextvars.ContextVar("coalescing", default=True)
+
+# Event loop on a daemon thread for blocking callers of async-only features
+# (hedging), started on first use so its connection pool stays warm
+_background_loop = None
+_background_lock = threading.Lock()
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global openai_client
+    if openai_client is None:
+        openai_client = create_openai_client()
+    return openai_client
+
+def get_perplexity_client():
+    """Return the shared Perplexity client, creating it on first use."""
+    global perplexity_client
+    if perplexity_client is None:
+        perplexity_client = create_perplexity_client()
+    return perplexity_client
+
+def _get_async_clients():
+    """Return the (openai, perplexity) async clients for the running event loop."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        # both clients on this loop share one keep-alive pool
+        http_client = create_http_client(asynchronous=True)
+        clients = (
+            create_openai_client(asynchronous=True, http_client=http_client),
+            create_perplexity_client(asynchronous=True, http_client=http_client),
+        )
+        _async_clients[loop] = clients
+    return clients
+
+def _parse_completion(data):
+    """Rebuild a ChatCompletion from its cached JSON."""
+    from openai.types.chat import ChatCompletion
+
+    return ChatCompletion.model_validate_json(data)
+
+def get_response_cache():
+    """Return the shared ResponseCache, or None if caching is disabled."""
+    global response_cache
+    load_env()  # LLM_CACHE / LLM_CACHE_PATH may be set in .env
+    if response_cache is None and os.getenv('LLM_CACHE', 'on').lower() not in ('0', 'off', 'false'):
+        import atexit
+
+        response_cache = ResponseCache(os.getenv('LLM_CACHE_PATH', DEFAULT_CACHE_PATH))
+        atexit.register(response_cache.flush)  # access times of memory-tier hits
+    return response_cache
+
+def _cache_lookup(use_cache, model, messages, **params):
+    """Return (cache, key, cached_value) for a request; cache is None when bypassed."""
+    cache = get_response_cache() if use_cache else None
+    if cache is None:
+        return None, None, None
+    key = make_cache_key(model, messages, **params)
+    return cache, key, cache.get(key)
+
+def _flight_key(model, messages, **params):
+    """Key under which identical in-flight requests share one upstream call (None if LLM_COALESCE=off)."""
+    load_env()  # LLM_COALESCE may be set in .env, and use_cache=False skips get_response_cache()
+    if not _coalescing.get() or os.getenv('LLM_COALESCE', 'on').lower() in ('0', 'off', 'false'):
+        return None
+    return make_cache_key(model, messages, **params)
+
+def _coalesced(key, request, stream=False):
+    """Run request(), sharing it with identical requests already in flight."""
+    if key is None:
+        return request()
+    if stream:
+        return get_coalescer().stream(key, request)
+    return get_coalescer().do(key, request)
+
+async def _coalesced_async(key, request, stream=False):
+    """Async version of _coalesced; request() returns an awaitable."""
+    if key is None:
+        return await request()
+    if stream:
+        return await get_coalescer().stream_async(key, request)
+    return await get_coalescer().do_async(key, request)
+
+def _run_in_background(coroutine):
+    """Run a coroutine on the shared background event loop and wait for its result."""
+    import asyncio
+
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="llm-utils-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop).result()
+
+def _keeps_system_messages(model):
+    """Whether system messages are sent to an OpenAI model (only gpt-4o gets them)."""
+    return model == "gpt-4o"
+
+def _prepare_openai_messages(messages, model):
+    """Normalize a query into an OpenAI message list for the given model."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    if not _keeps_system_messages(model):
+        messages = [msg for msg in messages if msg["role"] != "system"]
+    return messages
+
+def _perplexity_params(query, model, stream):
+    """Build the request parameters used for every Perplexity call."""
+    messages = [
+        {"role": "system", "content": "Be precise and concise."},
+        {"role": "user", "content": query}
+    ]
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.2,
+        "stream": stream
+    }
+
+def get_openai_completion(messages, model="gpt-4o", use_cache=True, priority="interactive", stream=False):
     """
     Get completion from OpenAI models.
     
+    Rate limits, retries and backoff are handled by the shared request scheduler.
+    
     Args:
         messages (list or str): List of message dictionaries or a single string query
         model (str): OpenAI model identifier
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
+        stream (bool): Return the chunk stream instead of waiting for the whole
+            reply (streams are never cached, and the reply is not appended to
+            the messages; see iter_stream_text)
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
     """
-    if isinstance(messages, str):
-        messages = [{"role": "user", "content": messages}]
-
     try:
-        if model != "gpt-4o":
-            messages = [msg for msg in messages if msg["role"] != "system"]
+        messages = _prepare_openai_messages(messages, model)
+        with get_metrics().call("openai", model, stream) as call:
+            if stream:
+                client = get_openai_client()
+                response = _coalesced(
+                    _flight_key(model, messages, stream=True),
+                    lambda: get_scheduler().call(
+                        model,
+                        call.counted(lambda: client.chat.completions.create(
+                            model=model, messages=messages, stream=True, stream_options=_STREAM_OPTIONS
+                        )),
+                        messages=messages, priority=priority
+                    ),
+                    stream=True
+                )
+                return messages, True, call.stream(response)
+
+            cache, key, ai_response = _cache_lookup(use_cache, model, messages)
+
+            if ai_response is None:
+                client = get_openai_client()
+                response = _coalesced(
+                    _flight_key(model, messages),
+                    lambda: get_scheduler().call(
+                        model,
+                        call.counted(lambda: client.chat.completions.create(model=model, messages=messages)),
+                        messages=messages, priority=priority
+                    )
+                )
+                call.usage(response)
+                ai_response = response.choices[0].message.content
+                if cache is not None and ai_response is not None:
+                    cache.set(key, ai_response)
 
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        
-        ai_response = response.choices[0].message.content
         messages.append({"role": "assistant", "content": ai_response})
         
         return messages, True, ai_response
@@ -46,52 +208,90 @@ def get_openai_completion(messages, model="gpt-4o"):
     except Exception as e:
         return messages, False, str(e)
 
-def get_perplexity_completion(query, model="sonar-pro", stream=False):
+def get_perplexity_completion(query, model="sonar-pro", stream=False, use_cache=True,
+                              priority="interactive"):
     """
     Get completion from Perplexity models.
     
     Args:
         query (str): User query
         model (str): Perplexity model name
-        stream (bool): Whether to stream the response
+        stream (bool): Whether to stream the response (streams are never cached)
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
         
     Returns:
         Response object or None if error
     """
-    messages = [
-        {"role": "system", "content": "Be precise and concise."},
-        {"role": "user", "content": query}
-    ]
-
-    params = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.2,
-        "stream": stream
-    }
+    params = _perplexity_params(query, model, stream)
 
     try:
-        response = perplexity_client.chat.completions.create(**params)
-        return response
+        with get_metrics().call("perplexity", model, stream) as call:
+            cache, key, cached = _cache_lookup(
+                use_cache and not stream, model, params["messages"],
+                temperature=params["temperature"]
+            )
+            if cached is not None:
+                return _parse_completion(cached)
+
+            client = get_perplexity_client()
+            response = _coalesced(
+                _flight_key(model, params["messages"], temperature=params["temperature"], stream=stream),
+                lambda: get_scheduler().call(
+                    model, call.counted(lambda: client.chat.completions.create(**params)),
+                    messages=params["messages"], priority=priority
+                ),
+                stream=stream
+            )
+            if stream:
+                return call.stream(response)
+            call.usage(response)
+            if cache is not None:
+                cache.set(key, response.model_dump_json())
+            return response
     except Exception as e:
         print(f"Error making Perplexity API call: {str(e)}")
         return None
 
-def get_llm_completion(query, model="gpt-4o", stream=False):
+def iter_stream_text(response):
+    """
+    Text fragments of a streamed reply, from either provider.
+    
+    Args:
+        response (iterable): ChatCompletionChunk stream from get_llm_completion(stream=True)
+        
+    Yields:
+        str: Each non-empty content delta
+    """
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def get_llm_completion(query, model="gpt-4o", stream=False, use_cache=True, priority="interactive",
+                       hedge=None):
     """
     Unified interface for getting completions from either OpenAI or Perplexity models.
     
     Args:
         query (str or list): User query or message list
         model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "o1-mini")
-        stream (bool): Whether to stream the response (Perplexity only)
+        stream (bool): Return a stream of ChatCompletionChunk objects instead of
+            the reply text, for either provider (iter_stream_text reads it)
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
+        hedge (HedgePolicy or bool, optional): Send a backup request if this one
+            is slow (True uses the shared policy; ignored for streams)
         
     Returns:
         tuple: (success, response/error_message)
     """
+    if hedge and not stream:
+        # racing and cancelling the loser needs an event loop
+        return _run_in_background(get_llm_completion_async(query, model, False, use_cache, priority, hedge))
+
     # Perplexity models
     if model.startswith("sonar"):
-        response = get_perplexity_completion(query, model, stream)
+        response = get_perplexity_completion(query, model, stream, use_cache, priority)
         if response:
             if stream:
                 return True, response
@@ -100,11 +300,230 @@ def get_llm_completion(query, model="gpt-4o", stream=False):
     
     # OpenAI models
     else:
-        messages, success, response = get_openai_completion(query, model)
+        messages, success, response = get_openai_completion(query, model, use_cache, priority, stream)
         return success, response
 
+# --- Async and batch variants ---
+
+async def get_openai_completion_async(messages, model="gpt-4o", use_cache=True, priority="interactive",
+                                      stream=False):
+    """
+    Async version of get_openai_completion using the shared async client.
+    
+    Args:
+        messages (list or str): List of message dictionaries or a single string query
+        model (str): OpenAI model identifier
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
+        stream (bool): Return an async chunk stream instead of the reply text
+        
+    Returns:
+        tuple: (updated_messages, success, response/error_message)
+    """
+    openai_async_client, _ = _get_async_clients()
+
+    try:
+        messages = _prepare_openai_messages(messages, model)
+        with get_metrics().call("openai", model, stream) as call:
+            if stream:
+                response = await _coalesced_async(
+                    _flight_key(model, messages, stream=True),
+                    lambda: get_scheduler().call_async(
+                        model,
+                        call.counted(lambda: openai_async_client.chat.completions.create(
+                            model=model, messages=messages, stream=True, stream_options=_STREAM_OPTIONS
+                        )),
+                        messages=messages, priority=priority
+                    ),
+                    stream=True
+                )
+                return messages, True, call.stream_async(response)
+
+            cache, key, ai_response = _cache_lookup(use_cache, model, messages)
+
+            if ai_response is None:
+                response = await _coalesced_async(
+                    _flight_key(model, messages),
+                    lambda: get_scheduler().call_async(
+                        model,
+                        call.counted(
+                            lambda: openai_async_client.chat.completions.create(model=model, messages=messages)
+                        ),
+                        messages=messages, priority=priority
+                    )
+                )
+                call.usage(response)
+                ai_response = response.choices[0].message.content
+                if cache is not None and ai_response is not None:
+                    cache.set(key, ai_response)
+
+        messages.append({"role": "assistant", "content": ai_response})
+
+        return messages, True, ai_response
+
+    except Exception as e:
+        return messages, False, str(e)
+
+async def get_perplexity_completion_async(query, model="sonar-pro", stream=False, use_cache=True,
+                                          priority="interactive"):
+    """
+    Async version of get_perplexity_completion using the shared async client.
+    
+    Args:
+        query (str): User query
+        model (str): Perplexity model name
+        stream (bool): Whether to stream the response (streams are never cached)
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
+        
+    Returns:
+        Response object (async stream if stream=True) or None if error
+    """
+    _, perplexity_async_client = _get_async_clients()
+    params = _perplexity_params(query, model, stream)
+
+    try:
+        with get_metrics().call("perplexity", model, stream) as call:
+            cache, key, cached = _cache_lookup(
+                use_cache and not stream, model, params["messages"],
+                temperature=params["temperature"]
+            )
+            if cached is not None:
+                return _parse_completion(cached)
+
+            response = await _coalesced_async(
+                _flight_key(model, params["messages"], temperature=params["temperature"], stream=stream),
+                lambda: get_scheduler().call_async(
+                    model, call.counted(lambda: perplexity_async_client.chat.completions.create(**params)),
+                    messages=params["messages"], priority=priority
+                ),
+                stream=stream
+            )
+            if stream:
+                return call.stream_async(response)
+            call.usage(response)
+            if cache is not None:
+                cache.set(key, response.model_dump_json())
+            return response
+    except Exception as e:
+        print(f"Error making Perplexity API call: {str(e)}")
+        return None
+
+async def get_llm_completion_async(query, model="gpt-4o", stream=False, use_cache=True,
+                                   priority="interactive", hedge=None):
+    """
+    Async version of get_llm_completion.
+    
+    Args:
+        query (str or list): User query or message list
+        model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "o1-mini")
+        stream (bool): Return an async stream of chunks instead of the reply text
+        use_cache (bool): Serve identical repeat requests from the response cache
+        priority (str): "interactive" requests are scheduled ahead of "batch" ones
+        hedge (HedgePolicy or bool, optional): Send a backup request if this one
+            is slow (True uses the shared policy; ignored for streams)
+        
+    Returns:
+        tuple: (success, response/error_message)
+    """
+    if hedge and not stream:
+        policy = get_hedge_policy() if hedge is True else hedge
+
+        async def attempt(target, backup):
+            if backup:
+                _coalescing.set(False)  # a backup joining the slow request would gain nothing
+            # each attempt gets its own copy, since a completion appends to the list
+            own_query = list(query) if isinstance(query, list) else query
+            return await get_llm_completion_async(own_query, target, False, use_cache, priority)
+
+        return await policy.run(model, attempt)
+
+    if model.startswith("sonar"):
+        response = await get_perplexity_completion_async(query, model, stream, use_cache, priority)
+        if response:
+            if stream:
+                return True, response
+            return True, response.choices[0].message.content
+        return False, "Failed to get Perplexity response"
+
+    messages, success, response = await get_openai_completion_async(query, model, use_cache, priority, stream)
+    return success, response
+
+async def batch_llm_completion_async(queries, model="gpt-4o", max_concurrency=8, use_cache=True):
+    """
+    Run many queries concurrently with at most max_concurrency requests in flight.
+    
+    Requests are scheduled at "batch" priority, so interactive calls made
+    meanwhile are not stuck behind them when rate limits bite.
+    
+    Args:
+        queries (list): Queries, each a string or a message list
+        model (str): Model identifier used for every query
+        max_concurrency (int): Maximum number of simultaneous API calls
+        use_cache (bool): Serve identical repeat requests from the response cache
+        
+    Returns:
+        list: (success, response/error_message) tuples in the same order as queries
+    """
+    import asyncio
+
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(query):
+        async with semaphore:
+            try:
+                return await get_llm_completion_async(query, model, use_cache=use_cache, priority="batch")
+            except Exception as e:
+                return False, str(e)
+
+    return list(await asyncio.gather(*(run_one(query) for query in queries)))
+
+def batch_llm_completion(queries, model="gpt-4o", max_concurrency=8, use_cache=True):
+    """
+    Blocking wrapper around batch_llm_completion_async for scripts and bulk jobs.
+    
+    Args:
+        queries (list): Queries, each a string or a message list
+        model (str): Model identifier used for every query
+        max_concurrency (int): Maximum number of simultaneous API calls
+        use_cache (bool): Serve identical repeat requests from the response cache
+        
+    Returns:
+        list: (success, response/error_message) tuples in the same order as queries
+    """
+    import asyncio
+
+    return asyncio.run(batch_llm_completion_async(queries, model, max_concurrency, use_cache))
+
+def summarize_history(previous_summary, messages, model="gpt-4o-mini"):
+    """
+    ContextWindow summarizer that folds older turns into a running summary.
+    
+    Args:
+        previous_summary (str or None): Summary of turns compacted earlier
+        messages (list): Turns being compacted now
+        model (str): Model used to write the summary
+        
+    Returns:
+        str: Updated summary
+        
+    Raises:
+        RuntimeError: If the call fails; ContextWindow then drops the turns instead
+    """
+    success, summary = get_llm_completion(summary_prompt(previous_summary, messages), model)
+    if not success:
+        raise RuntimeError(summary)
+    return summary
+
 def interactive_chat():
     """Interactive chat interface supporting both OpenAI and Perplexity models."""
+    from rich.console import Console
+    from markdown_stream import MarkdownStream
+
+    console = Console()
     models = {
         "1": "gpt-4o",
         "2": "o1-preview",
@@ -121,6 +540,10 @@ def interactive_chat():
     selected_model = models.get(model_choice, "gpt-4o")
     print(f"\nUsing model: {selected_model}")
 
+    # Perplexity calls take a single query, so only OpenAI chats keep history
+    keep_history = not selected_model.startswith("sonar")
+    context = ContextWindow(strategy="summarize", summarizer=summarize_history)
+
     messages = []
     if selected_model == "gpt-4o":
         messages.append({
@@ -134,24 +557,40 @@ def interactive_chat():
         user_input = input("\nYou: ").strip()
         
         if user_input.lower() == 'quit':
+            cache = get_response_cache()
+            if cache is not None:
+                stats = cache.stats()
+                print(f"\nCache: {stats['hits']} hits, {stats['misses']} misses")
+            coalesced = get_coalescer().stats()["coalesced"]
+            if coalesced:
+                print(f"Coalesced {coalesced} duplicate in-flight requests")
             print("\nGoodbye!")
             break
             
-        success, response = get_llm_completion(
-            messages + [{"role": "user", "content": user_input}] if messages else user_input,
-            selected_model
-        )
+        if keep_history:
+            messages.append({"role": "user", "content": user_input})
+            # the summary must survive _prepare_openai_messages dropping system messages
+            query = context.fit(messages, selected_model,
+                                system_role=_keeps_system_messages(selected_model))
+        else:
+            query = user_input
+
+        success, response = get_llm_completion(query, selected_model, stream=True)
         
         if success:
             print("\nAI:")
-            if isinstance(response, str):
-                md = Markdown(response)
-                console.print(md)
-            else:  # Streaming response
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
-                        print(chunk.choices[0].delta.content, end="")
-                print()
+            try:
+                # finished blocks are printed once; only the unfinished tail re-renders
+                with MarkdownStream(console) as view:
+                    for text in iter_stream_text(response):
+                        view.feed(text)
+            except Exception as e:  # the connection or provider failed mid-reply
+                print(f"\nError: {e}")
+                if keep_history:
+                    messages.pop()  # unanswered; the user can ask again
+                continue
+            if keep_history:
+                messages.append({"role": "assistant", "content": view.text})
         else:
             print(f"\nError: {response}")
             break
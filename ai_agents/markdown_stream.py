@@ -0,0 +1,151 @@
+"""
+Incremental Markdown rendering for streamed replies.
+
+Re-rendering the whole reply on every delta costs O(n^2) over a long answer.
+MarkdownStream prints each finished block once, above a rich Live view, and
+keeps only the unfinished tail in the Live view. A block is finished when,
+after a blank line or a closing code fence, a line starts a new top-level
+block: not indented and not a list item, which could continue a list or a
+list item's paragraphs. The tail is parsed only when the view refreshes, not
+on every delta.
+"""
+import re
+
+# Opening or closing code fence: up to three spaces, then ``` or ~~~ (or longer)
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+
+# Line that may continue the block before a blank line: indented, or a list item
+_CONTINUATION = re.compile(r"[ \t]|([-+*]|\d{1,9}[.)])([ \t]|$)")
+
+
+class MarkdownStream:
+    """
+    Live Markdown view of text arriving in fragments.
+
+    Usage:
+        with MarkdownStream(console) as view:
+            for text in fragments:
+                view.feed(text)
+        reply = view.text
+
+    Args:
+        console (rich.console.Console, optional): Console to render on
+        refresh_per_second (float): How often the tail is re-rendered
+    """
+
+    def __init__(self, console=None, refresh_per_second=10):
+        self.console = console
+        self.refresh_per_second = refresh_per_second
+        self._parts = []
+        self._tail = ""
+        self._scanned = 0      # offset in _tail of the first line not yet scanned
+        self._fence = None     # marker of the open code fence, if any
+        self._break = False    # a blank line or closing fence may end the block
+        self._printed = False  # whether a finished block has been printed yet
+        self._live = None
+
+    @property
+    def text(self):
+        """Everything fed so far."""
+        return "".join(self._parts)
+
+    def __enter__(self):
+        from rich.live import Live
+
+        self._live = Live(self, console=self.console, refresh_per_second=self.refresh_per_second,
+                          vertical_overflow="ellipsis")
+        self._live.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._live.stop()  # final render of the tail, in full
+        self._live = None
+        return False
+
+    def __rich__(self):
+        from rich.text import Text
+
+        return _Blocks(self._tail, self._printed) if self._tail.strip() else Text()
+
+    def feed(self, text):
+        """
+        Add a fragment of the reply.
+
+        Args:
+            text (str): Next fragment
+        """
+        if not text:
+            return
+        first = not self._parts
+        self._parts.append(text)
+        self._tail += text
+        if "\n" in text:
+            self._flush_blocks()
+        if first:
+            self._live.refresh()  # show the first tokens without waiting for a refresh tick
+
+    def _split(self):
+        """Offset in _tail where the finished blocks end (0 if none), scanning only new lines."""
+        boundary = 0
+        tail = self._tail
+        while True:
+            end = tail.find("\n", self._scanned)
+            if end < 0:
+                return boundary
+            start, line = self._scanned, tail[self._scanned:end]
+            self._scanned = end + 1
+            fence = _FENCE.match(line)
+            if self._fence is None:
+                if not line.strip():
+                    self._break = True
+                    continue
+                if self._break and not _CONTINUATION.match(line):
+                    boundary = start  # this line starts a new top-level block
+                self._break = False
+                if fence:
+                    self._fence = fence.group(1)
+            elif (fence and fence.group(1)[0] == self._fence[0]
+                  and len(fence.group(1)) >= len(self._fence) and not line[fence.end():].strip()):
+                self._fence = None
+                self._break = True
+
+    def _flush_blocks(self):
+        boundary = self._split()
+        if not boundary:
+            return
+        done, self._tail = self._tail[:boundary], self._tail[boundary:]
+        self._scanned -= boundary
+        if not done.strip():
+            return
+        self._live.console.print(_Blocks(done, self._printed))
+        self._printed = True
+
+
+class _Blocks:
+    """
+    Markdown for some blocks of a document rendered in pieces. After earlier
+    pieces, leading blank lines are replaced by the one-line gap Markdown puts
+    between blocks, and trailing blank lines are always dropped, so the pieces
+    line up like a single render.
+    """
+
+    def __init__(self, text, gap):
+        self.text = text
+        self.gap = gap
+
+    def __rich_console__(self, console, options):
+        from rich.markdown import Markdown
+        from rich.segment import Segment
+
+        lines = console.render_lines(Markdown(self.text), options, pad=False)
+        blank = [not "".join(segment.text for segment in line) for line in lines]
+        start, end = 0, len(lines)
+        if self.gap:
+            while start < end and blank[start]:
+                start += 1
+            yield Segment.line()
+        while end > start and blank[end - 1]:
+            end -= 1
+        for line in lines[start:end]:
+            yield from line
+            yield Segment.line()
@@ -0,0 +1,341 @@
+"""
+Compact chat messages and an on-disk log of each agent session.
+
+SDK message objects are pydantic models carrying every optional field the
+API can return; a long session holds thousands of them and none can be
+written out as they are. Message keeps only what the conversation needs in
+__slots__, and SessionStore appends each turn's messages to a JSON Lines file
+per session, so a session survives a restart and loads back with a single
+json.loads.
+
+Log format, one JSON value per line:
+    ["user", "hello"]                                   message: [role, content,
+    ["assistant", null, [["call_1", "look_up_item",      tool_calls, tool_call_id],
+      "{...}"]]]                                         trailing nulls dropped
+    ["tool", "item_132612938", null, "call_1"]
+    {"agent": "Sales Agent"}                            the active agent changed
+"""
+import json
+import os
+import re
+import sys
+
+DEFAULT_SESSION_DIR = os.path.join(os.path.expanduser("~"), ".cache", "suits_agents", "sessions")
+
+_SESSION_ID = re.compile(r"^[\w-]{1,128}$")
+
+
+class ToolCall:
+    """
+    A function call requested by the assistant.
+
+    Reads like the SDK object too (`call.function.name`), so tool execution and
+    ContextWindow handle both.
+    """
+
+    __slots__ = ("id", "name", "arguments")
+
+    def __init__(self, id, name, arguments):
+        self.id = id
+        self.name = name
+        self.arguments = arguments
+
+    @property
+    def function(self):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, ToolCall) and (self.id, self.name, self.arguments) == (
+            other.id, other.name, other.arguments)
+
+    def __repr__(self):
+        return f"ToolCall({self.id!r}, {self.name!r}, {self.arguments!r})"
+
+
+class Message:
+    """
+    One chat message.
+
+    Args:
+        role (str): "user", "assistant", "tool" or "system"
+        content (str, optional): Text of the message (a tool's result for "tool")
+        tool_calls (tuple, optional): ToolCalls requested by an assistant message
+        tool_call_id (str, optional): Call a "tool" message answers
+    """
+
+    __slots__ = ("role", "content", "tool_calls", "tool_call_id")
+
+    def __init__(self, role, content=None, tool_calls=None, tool_call_id=None):
+        self.role = sys.intern(role)  # one shared string per role across the history
+        self.content = content
+        self.tool_calls = tool_calls or None
+        self.tool_call_id = tool_call_id
+
+    @classmethod
+    def from_any(cls, message):
+        """
+        Convert a message dict or SDK message object.
+
+        Args:
+            message (dict, object or Message): Chat message
+
+        Returns:
+            Message: The message (unchanged if it already is one)
+        """
+        if isinstance(message, Message):
+            return message
+        if isinstance(message, dict):
+            get = message.get
+        else:
+            def get(name):
+                return getattr(message, name, None)
+        calls = get("tool_calls")
+        if calls:
+            calls = tuple(_tool_call(call) for call in calls)
+        return cls(get("role"), get("content"), calls, get("tool_call_id"))
+
+    def to_api(self):
+        """Return the message as a dict for the chat completions API."""
+        message = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            message["tool_calls"] = [
+                {"id": call.id, "type": "function",
+                 "function": {"name": call.name, "arguments": call.arguments}}
+                for call in self.tool_calls
+            ]
+        if self.tool_call_id is not None:
+            message["tool_call_id"] = self.tool_call_id
+        return message
+
+    def to_record(self):
+        """Return the message as a JSON-ready list (see the log format above)."""
+        record = [
+            self.role,
+            self.content,
+            [[call.id, call.name, call.arguments] for call in self.tool_calls] if self.tool_calls else None,
+            self.tool_call_id,
+        ]
+        while record[-1] is None:
+            record.pop()
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a message from a list written by to_record."""
+        message = cls(*record)
+        if message.tool_calls:
+            message.tool_calls = tuple(ToolCall(*call) for call in message.tool_calls)
+        return message
+
+    def __eq__(self, other):
+        return isinstance(other, Message) and self.to_record() == other.to_record()
+
+    def __repr__(self):
+        return f"Message({', '.join(repr(value) for value in self.to_record())})"
+
+
+def _tool_call(call):
+    """ToolCall from an SDK tool call, an API dict or a ContextWindow-style flat dict."""
+    if isinstance(call, ToolCall):
+        return call
+    if isinstance(call, dict):
+        function = call.get("function") or call
+        return ToolCall(call.get("id"), function.get("name"), function.get("arguments"))
+    return ToolCall(call.id, call.function.name, call.function.arguments)
+
+
+def _replay(records):
+    """
+    Messages and the last active agent from parsed log lines.
+
+    Raises:
+        ValueError, TypeError: For a line that is neither a message nor an agent change
+    """
+    messages = []
+    agent = None
+    for record in records:
+        if isinstance(record, dict):
+            agent = record.get("agent", agent)
+        elif isinstance(record, list) and record and isinstance(record[0], str):
+            messages.append(Message.from_record(record))
+        else:
+            raise ValueError(f"Not a log record: {record!r}")
+    return messages, agent
+
+
+def _complete_tool_calls(messages):
+    """
+    Leave out assistant tool calls whose results aren't all logged, and results
+    without their call, which the API would reject.
+    """
+    kept = []
+    i = 0
+    while i < len(messages):
+        message = messages[i]
+        if message.role == "tool":  # its call is missing
+            i += 1
+            continue
+        if message.role == "assistant" and message.tool_calls:
+            end = i + 1
+            while end < len(messages) and messages[end].role == "tool":
+                end += 1
+            answered = {result.tool_call_id for result in messages[i + 1:end]}
+            if all(call.id in answered for call in message.tool_calls):
+                kept.extend(messages[i:end])
+            i = end
+            continue
+        kept.append(message)
+        i += 1
+    return kept
+
+
+def _warn(text):
+    print(f"Session log: {text}", file=sys.stderr)
+
+
+def api_messages(messages):
+    """
+    Prepare a history for a chat completions request.
+
+    Args:
+        messages (list): Message objects and/or message dicts
+
+    Returns:
+        list: Message dicts
+    """
+    return [message.to_api() if isinstance(message, Message) else message for message in messages]
+
+
+class SessionStore:
+    """
+    Append-only JSON Lines log per session.
+
+    Args:
+        directory (str, optional): Where the logs are kept; defaults to
+            $AGENT_SESSION_DIR or ~/.cache/suits_agents/sessions
+        fsync (bool): Sync every append to disk. Without it an append survives
+            a crash of the process but not of the machine
+    """
+
+    def __init__(self, directory=None, fsync=False):
+        if directory is None:
+            from llm_clients import load_env
+
+            load_env()  # AGENT_SESSION_DIR may be set in .env
+        self.directory = directory or os.environ.get("AGENT_SESSION_DIR") or DEFAULT_SESSION_DIR
+        self.fsync = fsync
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, session_id):
+        """
+        Log file of a session.
+
+        Raises:
+            ValueError: If the id is not letters, digits, "_" and "-"
+        """
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def exists(self, session_id):
+        return os.path.exists(self.path(session_id))
+
+    def append(self, session_id, messages, agent=None):
+        """
+        Add messages to the end of a session's log.
+
+        Args:
+            session_id (str): Session to extend (its log is created if needed)
+            messages (list): Messages in any form Message.from_any accepts
+            agent (str, optional): Name of the agent active after these messages
+        """
+        lines = [
+            json.dumps(Message.from_any(message).to_record(), ensure_ascii=False, separators=(",", ":"))
+            for message in messages
+        ]
+        if agent is not None:
+            lines.append(json.dumps({"agent": agent}, ensure_ascii=False))
+        if not lines:
+            return
+        # one write per turn, so a crash leaves at most the last line incomplete
+        with open(self.path(session_id), "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self, session_id):
+        """
+        Read a session back.
+
+        Args:
+            session_id (str): Session to load
+
+        Returns:
+            tuple or None: (list of Message, name of the active agent or None),
+            or None if the session has no log
+        """
+        path = self.path(session_id)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # a cut-short append can end inside a multi-byte character
+        text = data.decode("utf-8", errors="replace")
+
+        try:
+            if text and not text.endswith("\n"):
+                raise ValueError("incomplete last line")
+            # JSON never contains a raw newline, so the lines parse as one array
+            records = json.loads("[" + text[:-1].replace("\n", ",") + "]") if text else []
+            messages, agent = _replay(records)
+        except (ValueError, TypeError):
+            messages, agent = self._recover(path, data, text)
+
+        complete = _complete_tool_calls(messages)
+        if len(complete) < len(messages):
+            _warn(f"{path}: left out {len(messages) - len(complete)} messages of tool calls "
+                  "without all their results")
+        return complete, agent
+
+    def _recover(self, path, data, text):
+        """
+        Read a damaged log line by line. Unreadable lines are skipped and
+        reported; an unterminated last line (an append cut short) is also cut
+        off the file, so the next append starts on a fresh line.
+        """
+        lines = text.split("\n")
+        if lines[-1]:
+            with open(path, "r+b") as f:
+                f.truncate(data.rfind(b"\n") + 1)
+            _warn(f"{path}: dropped an incomplete last line")
+
+        records = []
+        for number, line in enumerate(lines[:-1], 1):
+            try:
+                record = json.loads(line)
+                _replay([record])  # check it reads as a message or an agent change
+            except (ValueError, TypeError):
+                _warn(f"{path}:{number}: skipped an unreadable line")
+                continue
+            records.append(record)
+        return _replay(records)
+
+    def delete(self, session_id):
+        """Remove a session's log, if there is one."""
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def sessions(self):
+        """
+        List the stored sessions.
+
+        Returns:
+            list: Session ids, most recently written first
+        """
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".jsonl")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.name[:-len(".jsonl")] for entry in entries]
@@ -0,0 +1,533 @@
+"""
+Performance metrics for LLM calls and agent turns.
+
+llm_utils and openai_agents wrap every model call in ``get_metrics().call()``
+and every agent turn in ``get_metrics().turn()``. Each finished call records
+its latency, time to first token, token usage, estimated cost and retries;
+each turn records its latency, model calls and tool round trips. Records go
+to the configured exporters:
+
+- JsonlExporter: one JSON object per line (LLM_METRICS_JSONL=path)
+- PrometheusExporter: a node_exporter textfile with counters and histograms
+  (LLM_METRICS_PROM=path)
+
+With no exporter configured, call() and turn() hand back shared no-op
+records, so instrumented code pays only for a few method calls.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+
+# USD per million (prompt, completion) tokens by model prefix, for cost
+# estimates. The longest matching prefix wins; update as prices change.
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "o1": (15.00, 60.00),
+    "o1-mini": (3.00, 12.00),
+    "sonar": (1.00, 1.00),
+    "sonar-pro": (3.00, 15.00),
+}
+
+# Turn whose model calls are being recorded, so calls made deep inside a turn
+# (streaming, summarizing history) are added to it
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """
+    Estimated USD cost of a request.
+
+    Args:
+        model (str): Model identifier
+        prompt_tokens (int): Prompt tokens used
+        completion_tokens (int): Completion tokens used
+
+    Returns:
+        float or None: Cost, or None for models without a known price
+    """
+    best = None
+    for prefix in PRICES:
+        if model.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    if best is None:
+        return None
+    prompt_price, completion_price = PRICES[best]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+# --- Records ---
+
+class _NullRecord:
+    """Stand-in for _Call and _Turn when nothing is exported."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def counted(self, request):
+        return request
+
+    def usage(self, response):
+        pass
+
+    def stream(self, response):
+        return response
+
+    def stream_async(self, response):
+        return response
+
+    def tool_round_trip(self, calls):
+        pass
+
+    def handoff(self, agent):
+        pass
+
+    def tool_cache_hits(self, hits):
+        pass
+
+
+NULL_RECORD = _NullRecord()
+
+
+def _status(exc_type):
+    if exc_type is None:
+        return "ok"
+    import asyncio
+
+    return "cancelled" if issubclass(exc_type, asyncio.CancelledError) else "error"
+
+
+class _Call:
+    """
+    One model call, from the caller's point of view: retries, waiting for rate
+    limits and (for streams) reading the whole stream are all included.
+    """
+
+    def __init__(self, metrics, provider, model, stream):
+        self.metrics = metrics
+        self.provider = provider
+        self.model = model
+        self.is_stream = stream
+        self.turn = _current_turn.get()
+        self.attempts = 0
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.deferred = False
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or not self.deferred:
+            self.finish(_status(exc_type))
+        return False
+
+    def counted(self, request):
+        """Wrap the scheduler's request callable to count attempts (1 + retries)."""
+        def counted_request():
+            self.attempts += 1
+            return request()
+        return counted_request
+
+    def usage(self, response):
+        """Take token usage from a response or a stream chunk that reports it."""
+        usage = getattr(response, "usage", None)
+        if usage is not None and usage.prompt_tokens is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+
+    def _chunk(self, chunk):
+        if self.ttft is None and chunk.choices and (chunk.choices[0].delta.content
+                                                    or chunk.choices[0].delta.tool_calls):
+            self.ttft = time.perf_counter() - self.started
+        self.usage(chunk)
+
+    def stream(self, response):
+        """
+        Meter a chunk stream: the call finishes when the stream is exhausted or closed.
+
+        Returns:
+            generator: The same chunks
+        """
+        self.deferred = True
+
+        def metered():
+            status = "error"
+            try:
+                for chunk in response:
+                    self._chunk(chunk)
+                    yield chunk
+                status = "ok"
+            except GeneratorExit:
+                status = "ok"  # the reader stopped early; release the connection
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+                raise
+            finally:
+                self.finish(status)
+        return metered()
+
+    def stream_async(self, response):
+        """Async version of stream()."""
+        self.deferred = True
+
+        async def metered():
+            status = "error"
+            try:
+                async for chunk in response:
+                    self._chunk(chunk)
+                    yield chunk
+                status = "ok"
+            except GeneratorExit:
+                status = "ok"
+                close = getattr(response, "aclose", None) or getattr(response, "close", None)
+                if close is not None:
+                    await close()
+                raise
+            finally:
+                self.finish(status)
+        return metered()
+
+    def finish(self, status):
+        latency = time.perf_counter() - self.started
+        # no attempts means the reply came from the cache or a coalesced request
+        upstream = self.attempts > 0
+        prompt_tokens = self.prompt_tokens if upstream else None
+        completion_tokens = self.completion_tokens if upstream else None
+        cost = None
+        if prompt_tokens is not None:
+            cost = estimate_cost(self.model, prompt_tokens, completion_tokens or 0)
+        event = {
+            "event": "llm_call",
+            "time": time.time(),
+            "provider": self.provider,
+            "model": self.model,
+            "status": status,
+            "stream": self.is_stream,
+            "upstream": upstream,
+            "latency": latency,
+            "ttft": self.ttft,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost": cost,
+            "retries": max(0, self.attempts - 1),
+        }
+        if self.turn is not None:
+            self.turn.add_call(event)
+        self.metrics.emit(event)
+
+
+class _Turn:
+    """One run_full_turn: its model calls and tool round trips."""
+
+    def __init__(self, metrics, agent, model):
+        self.metrics = metrics
+        self.agent = agent
+        self.model = model
+        self.final_agent = agent
+        self.calls = 0
+        self.round_trips = 0
+        self.tool_calls = 0
+        self.cached_tool_calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self._lock = threading.Lock()
+        self._token = None
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        self._token = _current_turn.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_turn.reset(self._token)
+        self.metrics.emit({
+            "event": "agent_turn",
+            "time": time.time(),
+            "agent": self.agent,
+            "final_agent": self.final_agent,
+            "model": self.model,
+            "status": _status(exc_type),
+            "latency": time.perf_counter() - self.started,
+            "llm_calls": self.calls,
+            "tool_round_trips": self.round_trips,
+            "tool_calls": self.tool_calls,
+            "tool_cache_hits": self.cached_tool_calls,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost,
+        })
+        return False
+
+    def add_call(self, event):
+        with self._lock:
+            self.calls += 1
+            self.retries += event["retries"]
+            self.prompt_tokens += event["prompt_tokens"] or 0
+            self.completion_tokens += event["completion_tokens"] or 0
+            self.cost += event["cost"] or 0.0
+
+    def tool_round_trip(self, calls):
+        """Count one model response that asked for `calls` tool calls."""
+        self.round_trips += 1
+        self.tool_calls += calls
+
+    def handoff(self, agent):
+        """Note that the turn moved on to another agent."""
+        self.final_agent = agent
+
+    def tool_cache_hits(self, hits):
+        """Note how many tool calls were answered from the tool cache."""
+        self.cached_tool_calls = hits
+
+
+# --- Exporters ---
+
+class JsonlExporter:
+    """
+    Appends every record to a file as one JSON object per line.
+
+    Args:
+        path (str): File to append to
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1)  # line buffered
+        self._lock = threading.Lock()
+
+    def export(self, event):
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# Histogram buckets (upper bounds)
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+
+# name -> (type, help, buckets)
+_PROMETHEUS_METRICS = {
+    "llm_calls_total": ("counter", "LLM calls by outcome.", None),
+    "llm_upstream_calls_total": ("counter", "LLM calls that reached the API (not cached or coalesced).", None),
+    "llm_call_latency_seconds": ("histogram", "LLM call latency by outcome, retries and full streams included.",
+                                 _LATENCY_BUCKETS),
+    "llm_time_to_first_token_seconds": ("histogram", "Time to the first streamed token.", _LATENCY_BUCKETS),
+    "llm_tokens_total": ("counter", "Tokens used, by kind.", None),
+    "llm_cost_usd_total": ("counter", "Estimated cost in USD.", None),
+    "llm_retries_total": ("counter", "Retried LLM requests.", None),
+    "agent_turns_total": ("counter", "Agent turns by outcome.", None),
+    "agent_turn_latency_seconds": ("histogram", "Agent turn latency by outcome.", _LATENCY_BUCKETS),
+    "agent_tool_round_trips": ("histogram", "Tool round trips per agent turn.", _ROUND_TRIP_BUCKETS),
+    "agent_tool_calls_total": ("counter", "Tool calls made by agents.", None),
+    "agent_tool_cache_hits_total": ("counter", "Tool calls answered from the tool cache.", None),
+}
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class PrometheusExporter:
+    """
+    Aggregates records into counters and histograms and writes them in the
+    Prometheus text format, for node_exporter's textfile collector. The file
+    is replaced atomically, at most every `interval` seconds and on close().
+
+    Args:
+        path (str): File to write (name it *.prom)
+        interval (float): Minimum seconds between writes
+    """
+
+    def __init__(self, path, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self._values = {name: {} for name in _PROMETHEUS_METRICS}
+        self._lock = threading.Lock()
+        self._written = 0.0
+
+    def _inc(self, name, labels, amount=1):
+        values = self._values[name]
+        values[labels] = values.get(labels, 0) + amount
+
+    def _observe(self, name, labels, value):
+        buckets = _PROMETHEUS_METRICS[name][2]
+        state = self._values[name].get(labels)
+        if state is None:
+            state = self._values[name][labels] = [[0] * len(buckets), 0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                state[0][i] += 1
+        state[1] += value
+        state[2] += 1
+
+    def export(self, event):
+        with self._lock:
+            if event["event"] == "llm_call":
+                model = (("model", event["model"]),)
+                self._inc("llm_calls_total", (("provider", event["provider"]),) + model
+                          + (("status", event["status"]),))
+                if event["upstream"]:
+                    self._inc("llm_upstream_calls_total", model)
+                # fast failures would pull a shared histogram's percentiles down
+                self._observe("llm_call_latency_seconds", model + (("status", event["status"]),),
+                              event["latency"])
+                if event["ttft"] is not None:
+                    self._observe("llm_time_to_first_token_seconds", model, event["ttft"])
+                if event["prompt_tokens"] is not None:
+                    self._inc("llm_tokens_total", model + (("kind", "prompt"),), event["prompt_tokens"])
+                    self._inc("llm_tokens_total", model + (("kind", "completion"),),
+                              event["completion_tokens"] or 0)
+                if event["cost"] is not None:
+                    self._inc("llm_cost_usd_total", model, event["cost"])
+                if event["retries"]:
+                    self._inc("llm_retries_total", model, event["retries"])
+            elif event["event"] == "agent_turn":
+                agent = (("agent", event["agent"]),)
+                self._inc("agent_turns_total", agent + (("status", event["status"]),))
+                self._observe("agent_turn_latency_seconds", agent + (("status", event["status"]),),
+                              event["latency"])
+                self._observe("agent_tool_round_trips", agent, event["tool_round_trips"])
+                self._inc("agent_tool_calls_total", agent, event["tool_calls"])
+                if event["tool_cache_hits"]:
+                    self._inc("agent_tool_cache_hits_total", agent, event["tool_cache_hits"])
+
+            if time.monotonic() - self._written >= self.interval:
+                self._write()
+
+    def render(self):
+        """
+        Current values in the Prometheus text format.
+
+        Returns:
+            str: The exposition text
+        """
+        lines = []
+        for name, (kind, help_text, buckets) in _PROMETHEUS_METRICS.items():
+            values = self._values[name]
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(values.items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self):
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temporary, self.path)  # the collector never sees a partial file
+        self._written = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._write()
+
+
+# --- Registry ---
+
+class Metrics:
+    """
+    Hands out call and turn records and sends finished ones to the exporters.
+
+    Args:
+        exporters (list, optional): Objects with export(event) and close()
+    """
+
+    def __init__(self, exporters=None):
+        self.exporters = list(exporters or ())
+
+    def add_exporter(self, exporter):
+        """Start sending records to another exporter."""
+        self.exporters.append(exporter)
+
+    def call(self, provider, model, stream=False):
+        """
+        Record for one model call; use it as a context manager.
+
+        Args:
+            provider (str): "openai" or "perplexity"
+            model (str): Model identifier
+            stream (bool): Whether the reply is streamed (see _Call.stream)
+        """
+        if not self.exporters:
+            return NULL_RECORD
+        return _Call(self, provider, model, stream)
+
+    def turn(self, agent, model):
+        """
+        Record for one agent turn; use it as a context manager.
+
+        Args:
+            agent (str): Name of the agent the turn starts with
+            model (str): That agent's model
+        """
+        if not self.exporters:
+            return NULL_RECORD
+        return _Turn(self, agent, model)
+
+    def emit(self, event):
+        for exporter in self.exporters:
+            exporter.export(event)
+
+    def close(self):
+        """Flush and close every exporter."""
+        for exporter in self.exporters:
+            exporter.close()
+
+
+metrics = None
+
+
+def get_metrics():
+    """
+    Return the process-wide Metrics, creating it on first use with the
+    exporters named by LLM_METRICS_JSONL and LLM_METRICS_PROM.
+    """
+    global metrics
+    if metrics is None:
+        from llm_clients import load_env
+
+        load_env()  # the exporters may be configured in .env
+        metrics = Metrics()
+        if os.getenv("LLM_METRICS_JSONL"):
+            metrics.add_exporter(JsonlExporter(os.environ["LLM_METRICS_JSONL"]))
+        if os.getenv("LLM_METRICS_PROM"):
+            metrics.add_exporter(PrometheusExporter(os.environ["LLM_METRICS_PROM"]))
+        if metrics.exporters:
+            atexit.register(metrics.close)
+    return metrics
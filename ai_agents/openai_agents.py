@@ -1,19 +1,39 @@
-from openai import OpenAI
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import contextvars
+import uuid
 import json
 import inspect
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-# Initialize OpenAI client with API key from .env
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+import time
+
+from llm_clients import create_openai_client
+from request_scheduler import get_scheduler
+from metrics import get_metrics
+from context_window import ContextWindow, estimate_tokens, summary_prompt
+from message_store import Message, SessionStore, ToolCall, api_messages
+import tool_cache
+from tool_cache import cacheable, side_effecting
+
+# OpenAI client (API key from .env), created on first use by get_client()
+client = None
+
+# How tools ask the user a question: called with the prompt, returns the answer.
+# Terminal by default; agent_server.py points it at the session's client.
+ask_user = contextvars.ContextVar("ask_user", default=input)
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global client
+    if client is None:
+        client = create_openai_client()
+    return client
 
 # --- Helper Functions ---
 
 def function_to_schema(func) -> dict:
+    # Properties and "required" follow the signature order, so the schema
+    # (and its JSON) is identical every time it is built for a function.
     type_map = {
         str: "string",
         int: "integer",
@@ -60,16 +80,21 @@ def execute_tool_call(tool_call, tools_map):
     args = json.loads(tool_call.function.arguments)
 
     print(f"Assistant: {name}({args})")
-    return tools_map[name](**args)
+    cached, result = tool_cache.get_tool_cache().lookup(tools_map[name], args)
+    if cached:
+        return result
+    return tool_cache.get_tool_cache().call(tools_map[name], args)
 
 # --- Example Tools for the Customer Service Routine ---
 
+@cacheable(ttl=600, scope="global", maxsize=1024)
 def look_up_item(search_query):
     """Use to find item ID.
     Search query can be a description or keywords."""
     # Hard-coded item ID
     return "item_132612938"
 
+@side_effecting
 def execute_refund(item_id, reason="not provided"):
     print("Summary:", item_id, reason) # lazy summary
     return "success"
@@ -96,60 +121,344 @@ class Agent(BaseModel):
     instructions: str = "You are a helpful Agent"
     tools: list = []
 
+    # (tools snapshot, tool_schemas, tools_map) from the last compile
+    _compiled: Optional[tuple] = PrivateAttr(default=None)
+
+    def compiled_tools(self):
+        """
+        Return the tool schemas and name -> callable map for this agent.
+
+        They are built once and reused until `tools` is reassigned or mutated.
+
+        Returns:
+            tuple: (tool_schemas, tools_map)
+        """
+        snapshot = tuple(self.tools)
+        compiled = self._compiled
+        if compiled is None or compiled[0] != snapshot:
+            tool_schemas = [function_to_schema(tool) for tool in snapshot]
+            tools_map = {tool.__name__: tool for tool in snapshot}
+            compiled = self._compiled = (snapshot, tool_schemas, tools_map)
+        return compiled[1], compiled[2]
+
 class Response(BaseModel):
     agent: Optional[Agent]
     messages: list
-
-def run_full_turn(agent, messages):
+    tool_cache_hits: int = 0  # tool calls answered from tool_cache instead of running
+
+def run_full_turn(agent, messages, parallel_tool_calls=False, tool_timeout=None,
+                  stream=False, on_delta=None, context=None):
+    """
+    Run the agent until it produces a reply without tool calls.
+
+    Args:
+        agent (Agent): Agent that handles the turn
+        messages (list): Conversation history (not modified)
+        parallel_tool_calls (bool): Run the tool calls of one assistant message concurrently
+        tool_timeout (float or dict): Seconds from its start before a parallel or
+            streamed tool call is abandoned, either for every tool or per tool name.
+            A @side_effecting tool may still finish afterwards, so the model is told
+            its outcome is unknown rather than that it failed
+        stream (bool): Show text as it arrives and start tools before the message is complete
+        on_delta (callable): With stream=True, called with each text fragment
+            instead of printing it
+        context (ContextWindow, optional): Keeps the history sent to the model
+            within the agent model's token budget
+
+    Returns:
+        Response: Agent active at the end of the turn, the new messages (as
+        message_store.Message) and how many tool calls the tool cache answered
+    """
     current_agent = agent
     num_init_messages = len(messages)
     messages = messages.copy()
 
-    while True:
-
-        # turn python functions into tools and save a reverse map
-        tool_schemas = [function_to_schema(tool) for tool in current_agent.tools]
-        tools_map = {tool.__name__: tool for tool in current_agent.tools}
-
-        response = client.chat.completions.create(
-            model=current_agent.model,
-            messages=[{"role": "system", "content": current_agent.instructions}] + messages,
-            tools=tool_schemas or None,
-        )
-        message = response.choices[0].message
-        messages.append(message)
-
-        if message.content:  # print agent response
-            print(f"{current_agent.name}:", message.content)
+    # model calls made during the turn (streamed or not) are added to it;
+    # tool threads started inside share the turn's tool cache scope
+    with get_metrics().turn(agent.name, agent.model) as turn, tool_cache.turn() as cached_tools:
+        while True:
+
+            # python functions as tools plus a reverse map, compiled once per agent
+            tool_schemas, tools_map = current_agent.compiled_tools()
+
+            if context is not None:
+                # the instructions and tool schemas are sent too, so they count against the budget
+                reserved = (estimate_tokens({"content": current_agent.instructions})
+                            + (len(json.dumps(tool_schemas)) + 3) // 4)
+                request_messages = context.fit(messages, current_agent.model, reserved=reserved)
+            else:
+                request_messages = messages
+
+            if stream:
+                # tools start while the rest of the message is still streaming
+                message, results = stream_model_response(
+                    current_agent, request_messages, tool_schemas, tools_map,
+                    parallel_tool_calls, tool_timeout, on_delta
+                )
+                messages.append(message)
+            else:
+                request = [{"role": "system", "content": current_agent.instructions}] + api_messages(request_messages)
+                with get_metrics().call("openai", current_agent.model) as call:
+                    response = get_scheduler().call(
+                        current_agent.model,
+                        call.counted(lambda: get_client().chat.completions.create(
+                            model=current_agent.model, messages=request, tools=tool_schemas or None,
+                        )),
+                        messages=request,
+                    )
+                    call.usage(response)
+                message = Message.from_any(response.choices[0].message)
+                messages.append(message)
+
+                if message.content:  # print agent response
+                    print(f"{current_agent.name}:", message.content)
+
+            if not message.tool_calls:  # if finished handling tool calls, break
+                break
+            turn.tool_round_trip(len(message.tool_calls))
+
+            if stream:
+                pass
+            elif parallel_tool_calls and len(message.tool_calls) > 1:
+                results = execute_tool_calls_parallel(
+                    message.tool_calls, tools_map, current_agent, tool_timeout
+                )
+            else:
+                results = (
+                    _run_tool_call(tool_call, tools_map, current_agent)
+                    for tool_call in message.tool_calls
+                )
 
-        if not message.tool_calls:  # if finished handling tool calls, break
-            break
+            # results arrive in tool_calls order, so the last handoff wins exactly as in serial mode
+            for tool_call, result in zip(message.tool_calls, results):
+                if isinstance(result, Agent):
+                    current_agent = result
+                    turn.handoff(current_agent.name)
+                    result = (
+                        f"Transfered to {current_agent.name}. Adopt persona immediately."
+                    )
+                messages.append(Message("tool", result, tool_call_id=tool_call.id))
 
-        for tool_call in message.tool_calls:
-            result = execute_tool_call_extended(tool_call, tools_map, current_agent)
-            if isinstance(result, Agent):
-                current_agent = result
-                result = (
-                    f"Transfered to {current_agent.name}. Adopt persona immediately."
-                )
-            result_message = {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": result,
-            }
-            messages.append(result_message)
+        turn.tool_cache_hits(cached_tools.hits)
 
-    return Response(agent=current_agent, messages=messages[num_init_messages:])
+    return Response(
+        agent=current_agent, messages=messages[num_init_messages:], tool_cache_hits=cached_tools.hits
+    )
 
 def execute_tool_call_extended(tool_call, tools_map, agent):
     name = tool_call.function.name
     args = json.loads(tool_call.function.arguments)
+    tool = tools_map[name]
+    cached, result = tool_cache.get_tool_cache().lookup(tool, args)
+    if cached:
+        print(f"{agent.name}:", f"{name}({args}) (cached)")
+        return result
     print(f"{agent.name}:", f"{name}({args})")
-    return tools_map[name](**args)
+    return tool_cache.get_tool_cache().call(tool, args)
+
+def _resolve_tool_result(result):
+    """Await the result of an async tool when called from synchronous code."""
+    if inspect.isawaitable(result):
+        import asyncio
+
+        return asyncio.run(_await(result))
+    return result
+
+async def _await(awaitable):
+    return await awaitable
+
+def _run_tool_call(tool_call, tools_map, agent):
+    return _resolve_tool_result(execute_tool_call_extended(tool_call, tools_map, agent))
+
+def _tool_timeout(timeout, name):
+    """Timeout in seconds for a tool, from a single value or a per-name dict."""
+    if isinstance(timeout, dict):
+        return timeout.get(name)
+    return timeout
+
+def _timed_out(tool, name, seconds):
+    """Result the model sees for a tool call that ran out of time."""
+    if tool_cache.has_side_effects(tool):
+        # the call can't be stopped, so it may still go through
+        return (f"Error: {name} did not finish within {seconds} seconds and may still complete. "
+                "Its outcome is unknown: don't call it again, and tell the user to check "
+                "whether it went through.")
+    return f"Error: {name} timed out after {seconds} seconds."
+
+def execute_tool_calls_parallel(tool_calls, tools_map, agent, timeout=None):
+    """
+    Run several tool calls at once: sync tools on a thread pool, async tools as coroutines.
+
+    Args:
+        tool_calls (list): Tool calls from a single assistant message
+        tools_map (dict): Tool name -> callable
+        agent (Agent): Agent that issued the calls
+        timeout (float or dict): Seconds before a call is abandoned, for every tool or per tool name
+
+    Returns:
+        list: Tool results in the same order as tool_calls. A call that times out
+        yields an error string so the model can react to it (see _timed_out).
+    """
+    import asyncio
+
+    async def run_all(pool):
+        loop = asyncio.get_running_loop()
+
+        async def run_one(tool_call):
+            name = tool_call.function.name
+            if inspect.iscoroutinefunction(tools_map.get(name)):
+                pending = execute_tool_call_extended(tool_call, tools_map, agent)
+            else:
+                # tools see the caller's context variables (e.g. ask_user)
+                pending = loop.run_in_executor(
+                    pool, contextvars.copy_context().run,
+                    execute_tool_call_extended, tool_call, tools_map, agent
+                )
+            try:
+                return await asyncio.wait_for(pending, _tool_timeout(timeout, name))
+            except asyncio.TimeoutError:
+                return _timed_out(tools_map.get(name), name, _tool_timeout(timeout, name))
+
+        return await asyncio.gather(
+            *(run_one(tool_call) for tool_call in tool_calls), return_exceptions=True
+        )
+
+    pool = ThreadPoolExecutor(max_workers=len(tool_calls), thread_name_prefix="tool")
+    try:
+        results = asyncio.run(run_all(pool))
+    finally:
+        # Don't block on threads whose calls already timed out
+        pool.shutdown(wait=False)
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+def _arguments_complete(arguments):
+    """True once a streamed arguments string is a whole JSON object."""
+    if not arguments.rstrip().endswith("}"):
+        return False
+    try:
+        json.loads(arguments)
+    except ValueError:
+        return False
+    return True
+
+def stream_model_response(agent, messages, tool_schemas, tools_map,
+                          parallel_tool_calls=False, tool_timeout=None, on_delta=None):
+    """
+    Stream one model response, starting each tool call as soon as its arguments are complete.
+
+    Args:
+        agent (Agent): Agent generating the response
+        messages (list): Conversation history to send
+        tool_schemas (list): Tool schemas for the request
+        tools_map (dict): Tool name -> callable
+        parallel_tool_calls (bool): Let started tools run concurrently instead of one at a time
+        tool_timeout (float or dict): Seconds from when each tool call is started
+            until its result is given up on
+        on_delta (callable): Called with each text fragment; prints it when None
+
+    Returns:
+        tuple: (assistant Message, tool results in tool_calls order)
+    """
+    request = [{"role": "system", "content": agent.instructions}] + api_messages(messages)
+    with get_metrics().call("openai", agent.model, stream=True) as call:
+        response = call.stream(get_scheduler().call(
+            agent.model,
+            call.counted(lambda: get_client().chat.completions.create(
+                model=agent.model, messages=request, tools=tool_schemas or None, stream=True,
+                stream_options={"include_usage": True},  # final chunk reports usage
+            )),
+            messages=request,
+        ))
+
+    content = []
+    line_open = False  # default printer is mid-line
+    calls = {}  # index -> {"id", "name", "arguments"} assembled from deltas
+    futures = {}  # index -> Future of a started tool call
+    deadlines = {}  # index -> time.monotonic() by which its result is due, or None
+    pool = ThreadPoolExecutor(
+        max_workers=None if parallel_tool_calls else 1, thread_name_prefix="tool"
+    )
+
+    def start(index):
+        call = calls[index]
+        tool_call = ToolCall(call["id"], call["name"], call["arguments"])
+        futures[index] = pool.submit(
+            contextvars.copy_context().run, _run_tool_call, tool_call, tools_map, agent
+        )
+        seconds = _tool_timeout(tool_timeout, call["name"])
+        deadlines[index] = None if seconds is None else time.monotonic() + seconds
+
+    try:
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.content:
+                if on_delta is not None:
+                    on_delta(delta.content)
+                else:
+                    if not line_open:
+                        print(f"{agent.name}: ", end="")
+                        line_open = True
+                    print(delta.content, end="", flush=True)
+                content.append(delta.content)
+
+            if delta.tool_calls and line_open:
+                print()
+                line_open = False
+
+            for part in delta.tool_calls or ():
+                call = calls.setdefault(part.index, {"id": None, "name": "", "arguments": ""})
+                if part.id:
+                    call["id"] = part.id
+                if part.function and part.function.name:
+                    call["name"] += part.function.name
+                if part.function and part.function.arguments:
+                    call["arguments"] += part.function.arguments
+                if part.index not in futures and call["name"] and _arguments_complete(call["arguments"]):
+                    start(part.index)
+
+        if line_open:
+            print()
+
+        # anything not started yet (e.g. a call without arguments) runs now
+        for index in sorted(calls):
+            if index not in futures:
+                start(index)
+
+        results = []
+        for index in sorted(calls):
+            name = calls[index]["name"]
+            deadline = deadlines[index]
+            try:
+                results.append(futures[index].result(
+                    timeout=None if deadline is None else max(0.0, deadline - time.monotonic())
+                ))
+            except FutureTimeoutError:
+                seconds = _tool_timeout(tool_timeout, name)
+                if futures[index].cancel():  # still queued behind another tool
+                    results.append(f"Error: {name} did not start within {seconds} seconds and was not run.")
+                else:
+                    results.append(_timed_out(tools_map.get(name), name, seconds))
+    finally:
+        pool.shutdown(wait=False)
+
+    message = Message.from_any({
+        "role": "assistant",
+        "content": "".join(content) or None,
+        "tool_calls": [calls[index] for index in sorted(calls)],
+    })
+    return message, results
 
 # --- Defining More Tools and Agents ---
 
 # Basic tools for refunds and orders
+@side_effecting
 def execute_refund(item_name):
     print("\n\n=== Refund Summary ===")
     print(f"Item Name: {item_name}")
@@ -157,6 +466,7 @@ def execute_refund(item_name):
     print("Refund execution successful!")
     return "success"
 
+@side_effecting
 def place_order(item_name):
     print("\n\n=== Order Summary ===")
     print(f"Item: {item_name}")
@@ -177,13 +487,18 @@ sales_assistant = Agent(
 
 # More complex handoff example
 
+# What escalate_to_human returns; main() ends the terminal chat when it sees it,
+# while agent_server keeps serving other sessions
+ESCALATED = "Escalated to a human agent. Tell the user a person will follow up shortly."
+
+@side_effecting
 def escalate_to_human(summary):
     """Only call this if explicitly asked to."""
     print("Escalating to human agent...")
     print("\n=== Escalation Report ===")
     print(f"Summary: {summary}")
     print("=========================\n")
-    exit()
+    return ESCALATED
 
 def transfer_to_sales_agent():
     """Use for anything sales or buying related."""
@@ -209,13 +524,14 @@ triage_agent = Agent(
     tools=[transfer_to_sales_agent, transfer_to_issues_and_repairs, escalate_to_human],
 )
 
+@side_effecting
 def execute_order(product, price: int):
     """Price should be in USD."""
     print("\n\n=== Order Summary ===")
     print(f"Product: {product}")
     print(f"Price: ${price}")
     print("=================\n")
-    confirm = input("Confirm order? y/n: ").strip().lower()
+    confirm = ask_user.get()("Confirm order? y/n: ").strip().lower()
     if confirm == "y":
         print("Order execution successful!")
         return "Success"
@@ -239,6 +555,7 @@ sales_agent = Agent(
     tools=[execute_order, transfer_back_to_triage],
 )
 
+@cacheable(ttl=600, scope="global", maxsize=1024)
 def look_up_item(search_query):
     """Use to find item ID.
     Search query can be a description or keywords."""
@@ -246,6 +563,7 @@ def look_up_item(search_query):
     print("Found item:", item_id)
     return item_id
 
+@side_effecting
 def execute_refund(item_id, reason="not provided"):
     print("\n\n=== Refund Summary ===")
     print(f"Item ID: {item_id}")
@@ -271,13 +589,66 @@ issues_and_repairs_agent = Agent(
 
 # --- Final Interactive Loop ---
 
-agent = triage_agent
-messages = []
+def summarize_history(previous_summary, messages, model="gpt-4o-mini"):
+    """ContextWindow summarizer that folds older turns into a running summary."""
+    request = [{"role": "user", "content": summary_prompt(previous_summary, messages)}]
+    with get_metrics().call("openai", model) as call:
+        response = get_scheduler().call(
+            model, call.counted(lambda: get_client().chat.completions.create(model=model, messages=request)),
+            messages=request,
+        )
+        call.usage(response)
+    return response.choices[0].message.content
+
+def agent_named(name):
+    """The agent defined above called `name` (as stored in a session log), or None."""
+    agents = (triage_agent, sales_agent, issues_and_repairs_agent, refund_agent, sales_assistant)
+    return next((agent for agent in agents if agent.name == name), None)
+
+def main(session_id=None, store=None):
+    """
+    Chat in the terminal, logging the conversation so it can be resumed.
+
+    Args:
+        session_id (str, optional): Session to resume; a new one is started if
+            it has no log (or when None)
+        store (SessionStore, optional): Where sessions are logged
+    """
+    store = store or SessionStore()
+    session_id = session_id or uuid.uuid4().hex[:12]
+    agent = triage_agent
+    messages = []
+    context = ContextWindow(strategy="summarize", summarizer=summarize_history)
+    tool_cache.current_session.set(session_id)  # scope="session" tool results last the session
+
+    loaded = store.load(session_id)
+    if loaded is not None:
+        messages, agent_name = loaded
+        agent = agent_named(agent_name) or agent
+        print(f"Resumed session {session_id}: {len(messages)} messages, talking to {agent.name}")
+    else:
+        print(f"Session {session_id} (resume with --session {session_id})")
+
+    while True:
+        user = input("User: ")
+        messages.append(Message("user", user))
+
+        response = run_full_turn(agent, messages, stream=True, context=context)
+        store.append(
+            session_id, [messages[-1]] + response.messages,
+            agent=response.agent.name if response.agent is not agent else None,
+        )
+        agent = response.agent
+        messages.extend(response.messages)
+
+        if any(message.role == "tool" and message.content == ESCALATED for message in response.messages):
+            exit()  # a person takes over from here
 
-while True:
-    user = input("User: ")
-    messages.append({"role": "user", "content": user})
+if __name__ == "__main__":
+    import argparse
 
-    response = run_full_turn(agent, messages)
-    agent = response.agent
-    messages.extend(response.messages)
+    parser = argparse.ArgumentParser(description="Chat with the customer service agents")
+    parser.add_argument("--session", help="Session id to resume")
+    parser.add_argument("--sessions-dir", help="Where session logs are kept")
+    args = parser.parse_args()
+    main(args.session, SessionStore(args.sessions_dir))
@@ -0,0 +1,377 @@
+"""
+Rate-limit-aware scheduling and retries for LLM API calls.
+
+Every request goes through the shared RequestScheduler (get_scheduler()),
+which:
+- waits for per-model requests-per-minute and tokens-per-minute token buckets,
+  letting interactive requests go ahead of queued batch ones. There are no
+  buckets unless limits are configured (LLM_RATE_LIMITS), so by default
+  requests are only slowed by the API's own 429s;
+- retries 429s, timeouts, connection errors and 5xx responses with jittered
+  exponential backoff, honoring Retry-After (and pausing that model for
+  everyone while it is in effect);
+- corrects the token bucket with the real usage once a response arrives.
+
+The SDK clients are created with max_retries=0 (see llm_clients), so this is
+the only retry layer.
+"""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from context_window import estimate_tokens
+from llm_clients import load_env
+
+# (requests per minute, tokens per minute) by model prefix; None means unlimited.
+# The longest matching prefix wins. Empty by default: account tiers differ too
+# much to guess, and the lowest tier's figures would throttle batches far below
+# what most accounts allow, so until limits are set only the API's 429s (with
+# backoff) slow requests down. Set them with RequestScheduler(limits=...) or the
+# LLM_RATE_LIMITS environment variable ("gpt-4o=500/30000,sonar=50/0").
+DEFAULT_LIMITS = {}
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Status codes worth retrying besides 5xx
+_RETRY_STATUSES = (408, 409, 429)
+
+# Completion tokens assumed before a response reports its real usage
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def parse_limits(spec):
+    """
+    Parse "model=RPM/TPM,..." into a limits dict (0 means unlimited).
+
+    Args:
+        spec (str): Comma-separated limits, e.g. "gpt-4o=500/30000,sonar=50/0"
+
+    Returns:
+        dict: model prefix -> (rpm, tpm)
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rates = item.partition("=")
+        rpm, _, tpm = rates.partition("/")
+        limits[model.strip()] = (int(rpm) or None, int(tpm or 0) or None)
+    return limits
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 units a second, holding at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (requests larger than capacity wait for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge (positive) or refund (negative) units after the fact."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _ModelState:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.waiting = []  # heap of (priority, sequence) tickets
+        self.blocked_until = 0.0  # set from Retry-After
+
+
+def is_retryable(error):
+    """True for rate limits, timeouts, connection failures and server errors."""
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in _RETRY_STATUSES or status >= 500)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:  # an HTTP date; fall back to backoff
+        pass
+    return None
+
+
+class RequestScheduler:
+    """
+    Shared admission control and retry policy for LLM requests. Thread-safe,
+    and usable from both blocking code and event loops.
+
+    Args:
+        limits (dict, optional): model prefix -> (rpm, tpm); defaults to
+            LLM_RATE_LIMITS, and without it no model is throttled client-side
+        max_retries (int): Retries after the first attempt
+        base_delay (float): First backoff step in seconds
+        max_delay (float): Largest backoff (and Retry-After) honored, in seconds
+    """
+
+    def __init__(self, limits=None, max_retries=4, base_delay=0.5, max_delay=30.0):
+        if limits is None:
+            load_env()  # LLM_RATE_LIMITS may be set in .env
+            limits = dict(DEFAULT_LIMITS)
+            limits.update(parse_limits(os.getenv("LLM_RATE_LIMITS", "")))
+        self.limits = limits
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._models = {}
+        self._sequence = itertools.count()
+        self._random = random.Random()
+        self._stats = {
+            "requests": 0, "retries": 0, "failures": 0,
+            "throttled_seconds": 0.0, "backoff_seconds": 0.0,
+        }
+
+    # --- Admission ---
+
+    def _limits_for(self, model):
+        best = None
+        for prefix in self.limits:
+            if model.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.limits[best] if best is not None else (None, None)
+
+    def _state(self, model):
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(*self._limits_for(model))
+        return state
+
+    def _enqueue(self, model, priority):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = (PRIORITIES[priority], next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._state(model).waiting, ticket)
+            self._cond.notify_all()  # a more urgent ticket may now be first in line
+        return ticket
+
+    def _dequeue(self, model, ticket):
+        with self._cond:
+            waiting = self._state(model).waiting
+            if ticket in waiting:
+                waiting.remove(ticket)
+                heapq.heapify(waiting)
+                self._cond.notify_all()
+
+    def _try_acquire(self, model, ticket, tokens):
+        """
+        Take capacity for ticket if it is first in line (caller holds the lock).
+
+        Returns:
+            float or None: 0 once acquired, seconds to wait for capacity, or
+            None while other tickets are ahead
+        """
+        state = self._state(model)
+        if state.waiting[0] != ticket:
+            return None
+        now = time.monotonic()
+        wait = state.blocked_until - now
+        if state.requests is not None:
+            wait = max(wait, state.requests.wait_time(1, now))
+        if state.tokens is not None:
+            wait = max(wait, state.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if state.requests is not None:
+            state.requests.take(1)
+        if state.tokens is not None:
+            state.tokens.take(tokens)
+        heapq.heappop(state.waiting)
+        self._stats["requests"] += 1
+        self._cond.notify_all()
+        return 0
+
+    def acquire(self, model, tokens, priority="interactive"):
+        """
+        Block until the model's buckets admit a request of about `tokens` tokens.
+
+        Args:
+            model (str): Model identifier
+            tokens (int): Estimated prompt plus completion tokens
+            priority (str): "interactive" requests are admitted before "batch" ones
+        """
+        started = time.monotonic()
+        ticket = self._enqueue(model, priority)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_acquire(model, ticket, tokens)
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+                self._stats["throttled_seconds"] += time.monotonic() - started
+        except BaseException:
+            self._dequeue(model, ticket)
+            raise
+
+    async def acquire_async(self, model, tokens, priority="interactive"):
+        """Event loop version of acquire(); waits with asyncio.sleep instead of blocking."""
+        import asyncio
+
+        started = time.monotonic()
+        ticket = self._enqueue(model, priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(model, ticket, tokens)
+                if wait == 0:
+                    break
+                await asyncio.sleep(0.01 if wait is None else wait)
+            with self._cond:
+                self._stats["throttled_seconds"] += time.monotonic() - started
+        except BaseException:
+            self._dequeue(model, ticket)
+            raise
+
+    # --- Retries ---
+
+    def _retry_delay(self, model, error, attempt):
+        """Seconds to wait before retrying, or None if the error should be raised."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            with self._cond:
+                self._stats["failures"] += 1
+            return None
+
+        delay = retry_after(error)
+        with self._cond:
+            if delay is not None:
+                delay = min(delay, self.max_delay)
+                # everyone else sending to this model holds off too
+                state = self._state(model)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            else:
+                # full jitter: uniform over [0, base * 2^attempt], capped
+                delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            self._stats["retries"] += 1
+            self._stats["backoff_seconds"] += delay
+        return delay
+
+    def _settle(self, model, estimated, response):
+        """Correct the token bucket with the usage the API reported."""
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if total is None:
+            return
+        with self._cond:
+            state = self._state(model)
+            if state.tokens is not None:
+                state.tokens.adjust(total - estimated)
+
+    def estimate(self, messages, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+        """Tokens to reserve for a request: the prompt estimate plus expected completion."""
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        return sum(estimate_tokens(message) for message in messages or ()) + completion_tokens
+
+    def call(self, model, request, messages=None, priority="interactive"):
+        """
+        Run a blocking API call under the rate limits, retrying transient failures.
+
+        Args:
+            model (str): Model identifier
+            request (callable): Makes the API call and returns its response
+            messages (list or str, optional): Prompt, for the token estimate
+            priority (str): "interactive" or "batch"
+
+        Returns:
+            The response from request()
+
+        Raises:
+            The last error once retries are exhausted or it is not retryable
+        """
+        tokens = self.estimate(messages)
+        for attempt in itertools.count():
+            self.acquire(model, tokens, priority)
+            try:
+                response = request()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(model, tokens, response)
+            return response
+
+    async def call_async(self, model, request, messages=None, priority="interactive"):
+        """
+        Async version of call().
+
+        Args:
+            model (str): Model identifier
+            request (callable): Returns an awaitable making the API call
+            messages (list or str, optional): Prompt, for the token estimate
+            priority (str): "interactive" or "batch"
+
+        Returns:
+            The awaited response
+        """
+        import asyncio
+
+        tokens = self.estimate(messages)
+        for attempt in itertools.count():
+            await self.acquire_async(model, tokens, priority)
+            try:
+                response = await request()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._settle(model, tokens, response)
+            return response
+
+    def stats(self):
+        """
+        Report scheduling activity.
+
+        Returns:
+            dict: requests admitted, retries, failures given up on, and seconds
+            spent waiting for rate limits and in backoff
+        """
+        with self._cond:
+            return dict(self._stats)
+
+
+scheduler = None
+
+
+def get_scheduler():
+    """Return the process-wide RequestScheduler, creating it on first use."""
+    global scheduler
+    if scheduler is None:
+        scheduler = RequestScheduler()
+    return scheduler
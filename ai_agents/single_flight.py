@@ -0,0 +1,376 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+While a request is in flight, identical requests (same key, e.g. from
+llm_cache.make_cache_key) wait for it and share its result instead of
+calling upstream again. Streams are fanned out: every subscriber receives
+every chunk of the one upstream stream, including chunks that arrived
+before it joined. A flight ends when its result (or the end of its stream)
+is delivered, so later requests go upstream again.
+"""
+import threading
+import weakref
+
+_PULL = object()  # this subscriber fetches the next upstream chunk
+
+
+class _Call:
+    """A blocking call in flight; waiters block on `done`."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    """An async call in flight; cancelled once every waiter has given up on it."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    """
+    A blocking stream in flight. Chunks are buffered as they arrive and
+    whichever subscriber runs out of buffered chunks first pulls the next
+    one from upstream, so no extra thread is needed.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()  # set once the upstream call returned
+        self.upstream = None
+        self.error = None
+        self.chunks = []
+        self.finished = False
+        self.pulling = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls, for blocking code and event loops.
+
+    Async flights are kept per event loop and are separate from blocking
+    flights (their results are bound to the loop).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._async_calls = weakref.WeakKeyDictionary()  # loop -> {key: _AsyncCall}
+        self._async_streams = weakref.WeakKeyDictionary()  # loop -> {key: _AsyncStream}
+        self._stats = {"calls": 0, "upstream": 0, "coalesced": 0}
+
+    def _count(self, leader):
+        self._stats["calls"] += 1
+        self._stats["upstream" if leader else "coalesced"] += 1
+
+    # --- Blocking calls ---
+
+    def do(self, key, fn):
+        """
+        Call fn(), or wait for an identical in-flight call and share its result.
+
+        Args:
+            key (str): Identifies identical requests
+            fn (callable): Makes the request
+
+        Returns:
+            fn()'s result (the leader's, for coalesced callers)
+
+        Raises:
+            Whatever fn() raised, in every caller that shared it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    # --- Blocking streams ---
+
+    def stream(self, key, fn):
+        """
+        Subscribe to an identical in-flight stream, or start one with fn().
+
+        Args:
+            key (str): Identifies identical requests
+            fn (callable): Starts the upstream request and returns an iterable of chunks
+
+        Returns:
+            generator: Every chunk of the shared upstream stream, from the first
+
+        Raises:
+            Whatever fn() raised, in every subscriber waiting for it
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Stream()
+            with flight.cond:
+                flight.subscribers += 1
+            self._count(leader)
+
+        if leader:
+            try:
+                flight.upstream = iter(fn())
+            except BaseException as e:
+                flight.error = e
+                self._end_stream(key, flight)
+                raise
+            finally:
+                flight.ready.set()
+        else:
+            flight.ready.wait()
+            if flight.upstream is None:
+                self._release(key, flight)
+                raise flight.error
+        return self._subscribe(key, flight)
+
+    def _end_stream(self, key, flight):
+        with self._lock:
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+        with flight.cond:
+            flight.finished = True
+            flight.pulling = False
+            flight.cond.notify_all()
+
+    def _release(self, key, flight):
+        """Drop a subscriber; the last one to leave closes an unfinished upstream."""
+        with flight.cond:
+            flight.subscribers -= 1
+            abandoned = flight.subscribers == 0 and not flight.finished
+        if abandoned:
+            self._end_stream(key, flight)
+            close = getattr(flight.upstream, "close", None)
+            if close is not None:
+                close()
+
+    def _subscribe(self, key, flight):
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.finished and flight.pulling:
+                        flight.cond.wait()
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                        index += 1
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = _PULL
+
+                if chunk is _PULL:
+                    try:
+                        item = next(flight.upstream)
+                    except StopIteration:
+                        self._end_stream(key, flight)
+                        continue
+                    except BaseException as e:
+                        flight.error = e
+                        self._end_stream(key, flight)
+                        continue
+                    with flight.cond:
+                        flight.chunks.append(item)
+                        flight.pulling = False
+                        flight.cond.notify_all()
+                    continue
+
+                yield chunk
+        finally:
+            self._release(key, flight)
+
+    # --- Async calls ---
+
+    def _loop_flights(self, table):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        flights = table.get(loop)
+        if flights is None:
+            flights = table[loop] = {}
+        return flights
+
+    async def do_async(self, key, fn):
+        """
+        Async version of do(): await fn(), or an identical call already in flight.
+
+        Args:
+            key (str): Identifies identical requests
+            fn (callable): Returns an awaitable making the request
+
+        Returns:
+            The awaited result
+        """
+        import asyncio
+
+        with self._lock:
+            flights = self._loop_flights(self._async_calls)
+            call = flights.get(key)
+            leader = call is None
+            if leader:
+                call = flights[key] = _AsyncCall(asyncio.ensure_future(fn()))
+                call.task.add_done_callback(lambda _: flights.pop(key, None))
+            call.waiters += 1
+            self._count(leader)
+
+        try:
+            # a cancelled caller must not cancel the request others are waiting on...
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()  # ...but once nobody is waiting, it is abandoned
+
+    # --- Async streams ---
+
+    async def stream_async(self, key, fn):
+        """
+        Async version of stream().
+
+        Args:
+            key (str): Identifies identical requests
+            fn (callable): Returns an awaitable that starts the upstream request
+                and yields an async iterable of chunks
+
+        Returns:
+            async generator: Every chunk of the shared upstream stream, from the first
+        """
+        import asyncio
+
+        with self._lock:
+            flights = self._loop_flights(self._async_streams)
+            flight = flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = flights[key] = _AsyncStream(asyncio.ensure_future(fn()))
+            flight.subscribers += 1
+            self._count(leader)
+
+        try:
+            upstream = await asyncio.shield(flight.started)
+        except BaseException:
+            flight.subscribers -= 1
+            if flights.get(key) is flight:
+                del flights[key]
+            raise
+        if flight.upstream is None:
+            flight.upstream = upstream.__aiter__()
+        return self._subscribe_async(flights, key, flight)
+
+    async def _subscribe_async(self, flights, key, flight):
+        index = 0
+        try:
+            while True:
+                async with flight.cond:
+                    while index >= len(flight.chunks) and not flight.finished and flight.pulling:
+                        await flight.cond.wait()
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                        index += 1
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = _PULL
+
+                if chunk is _PULL:
+                    try:
+                        item = await flight.upstream.__anext__()
+                    except StopAsyncIteration:
+                        await self._end_stream_async(flights, key, flight)
+                        continue
+                    except BaseException as e:
+                        flight.error = e
+                        await self._end_stream_async(flights, key, flight)
+                        continue
+                    async with flight.cond:
+                        flight.chunks.append(item)
+                        flight.pulling = False
+                        flight.cond.notify_all()
+                    continue
+
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                await self._end_stream_async(flights, key, flight)
+                close = getattr(flight.upstream, "close", None) or getattr(flight.upstream, "aclose", None)
+                if close is not None:
+                    await close()
+
+    async def _end_stream_async(self, flights, key, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+        async with flight.cond:
+            flight.finished = True
+            flight.pulling = False
+            flight.cond.notify_all()
+
+    def stats(self):
+        """
+        Report coalescing.
+
+        Returns:
+            dict: calls seen, upstream requests made, and coalesced calls
+            (upstream requests saved)
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+class _AsyncStream:
+    """An async stream in flight, buffered and pulled like _Stream."""
+
+    def __init__(self, started):
+        import asyncio
+
+        self.started = started  # task returning the upstream async iterable
+        self.upstream = None
+        self.error = None
+        self.chunks = []
+        self.finished = False
+        self.pulling = False
+        self.subscribers = 0
+        self.cond = asyncio.Condition()
+
+
+coalescer = None
+
+
+def get_coalescer():
+    """Return the process-wide SingleFlight, creating it on first use."""
+    global coalescer
+    if coalescer is None:
+        coalescer = SingleFlight()
+    return coalescer
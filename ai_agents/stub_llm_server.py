@@ -0,0 +1,311 @@
+"""
+Local stand-in for the OpenAI / Perplexity chat completions endpoint.
+
+Serves POST /chat/completions (and /v1/chat/completions) with configurable
+latency, streamed chunks, scripted tool calls and injected errors, so the
+LLM layer can be exercised and benchmarked without real API calls.
+
+Usage:
+    python stub_llm_server.py [--port 8089] [--latency lognormal:0.2,0.5]
+        [--chunks 20] [--chunk-delay 0.01] [--error-rate 0.02]
+        [--tool-call look_up_item '{"search_query": "anvil"}']
+
+Point a client at it with base_url="http://127.0.0.1:8089/v1" and any api_key.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "acme roadrunner anvil rocket desert canyon coyote catapult spring magnet "
+    "dynamite tunnel paint boulder cliff trap order refund repair catalog"
+).split()
+
+
+def parse_latency(spec):
+    """
+    Build a latency sampler from a distribution spec.
+
+    Args:
+        spec (str): "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,STDDEV" or
+            "lognormal:MEDIAN,SIGMA", all in seconds
+
+    Returns:
+        callable: Takes a random.Random and returns a delay in seconds
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",")] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: values[0] * math.exp(rng.gauss(0.0, values[1]))
+    raise ValueError(f"Bad latency spec: {spec!r}")
+
+
+class StubBehavior:
+    """
+    How the stub responds.
+
+    Args:
+        latency (str): Time to first token, as a parse_latency spec
+        chunks (int): Content chunks per reply (streamed one by one when stream=True)
+        chunk_delay (float): Seconds between chunks
+        error_rate (float): Fraction of requests answered with error_status
+        error_status (int): HTTP status for injected errors (429 adds Retry-After)
+        retry_after (float): Retry-After seconds sent with 429 errors
+        tool_calls (list): Scripted (name, arguments dict) calls made when the
+            request offers those tools and the last message is not a tool result
+        seed (int, optional): Random seed, for reproducible runs
+    """
+
+    def __init__(self, latency="fixed:0.05", chunks=10, chunk_delay=0.005, error_rate=0.0,
+                 error_status=429, retry_after=0.1, tool_calls=None, seed=None):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.tool_calls = list(tool_calls or [])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def draw(self):
+        """Decide one request's fate: (latency seconds, inject error)."""
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return self.sample_latency(self._rng), fail
+
+    def reply_words(self, request_id):
+        """Deterministic reply text for a request, one piece per chunk."""
+        rng = random.Random(request_id)
+        return [(" " if i else "") + " ".join(rng.choice(WORDS) for _ in range(3)) for i in range(self.chunks)]
+
+    def scripted_calls(self, body):
+        """Tool calls to make for this request, or [] to answer with text."""
+        messages = body.get("messages") or []
+        if not self.tool_calls or (messages and messages[-1].get("role") == "tool"):
+            return []
+        offered = {tool["function"]["name"] for tool in body.get("tools") or ()}
+        return [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for name, arguments in self.tool_calls
+            if name in offered
+        ]
+
+
+def _prompt_tokens(body):
+    # about four characters per token, as in context_window.estimate_tokens
+    return sum(len(str(message.get("content") or "")) for message in body.get("messages") or ()) // 4 + 1
+
+
+def _usage(body, content, tool_calls):
+    prompt_tokens = _prompt_tokens(body)
+    completion_tokens = (len(content) + len(json.dumps(tool_calls) if tool_calls else "")) // 4 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler; the server's `behavior` attribute drives every reply."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client dropped the connection (idle, or cancelled its request)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            return
+
+        behavior = self.server.behavior
+        latency, fail = behavior.draw()
+        time.sleep(latency)
+        if fail:
+            headers = {"Retry-After": f"{behavior.retry_after:g}"} if behavior.error_status == 429 else {}
+            self._send_json(behavior.error_status, {
+                "error": {"message": "Injected stub error", "type": "rate_limit_error"
+                          if behavior.error_status == 429 else "server_error"},
+            }, headers)
+            return
+
+        request_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "stub")
+        tool_calls = behavior.scripted_calls(body)
+        pieces = [] if tool_calls else behavior.reply_words(request_id)
+
+        if body.get("stream"):
+            self._stream(request_id, model, pieces, tool_calls, body)
+            return
+
+        time.sleep(behavior.chunk_delay * len(pieces))
+        content = "".join(pieces)
+        self._send_json(200, {
+            "id": request_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": content or None,
+                    "tool_calls": tool_calls or None,
+                },
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": _usage(body, content, tool_calls),
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        # HTTP/1.1 chunked transfer encoding keeps the connection reusable
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, request_id, model, pieces, tool_calls, body):
+        behavior = self.server.behavior
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta, finish_reason=None, usage=None):
+            chunk = {
+                "id": request_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                if usage is None else [],
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            self._write_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(behavior.chunk_delay)
+                event({"content": piece})
+            for index, call in enumerate(tool_calls):
+                # name first, then the arguments in two pieces, like the real API
+                arguments = call["function"]["arguments"]
+                half = len(arguments) // 2
+                event({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                       "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                for part in (arguments[:half], arguments[half:]):
+                    time.sleep(behavior.chunk_delay)
+                    event({"tool_calls": [{"index": index, "function": {"arguments": part}}]})
+            event({}, "tool_calls" if tool_calls else "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                # like the real API: a final chunk with no choices and the usage
+                event(None, usage=_usage(body, "".join(pieces), tool_calls))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client went away mid-stream
+
+
+def start_stub_server(behavior=None, host="127.0.0.1", port=0):
+    """
+    Run the stub on a background thread.
+
+    Args:
+        behavior (StubBehavior, optional): Response behavior (defaults to StubBehavior())
+        host (str): Interface to bind
+        port (int): Port to bind, 0 for any free port
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.behavior = behavior or StubBehavior()
+    thread = threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible chat completions stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='fixed:0.05', help='Time to first token distribution')
+    parser.add_argument('--chunks', type=int, default=10, help='Content chunks per reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.005, help='Seconds between chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=429, help='HTTP status of injected errors')
+    parser.add_argument('--tool-call', nargs=2, action='append', metavar=('NAME', 'ARGS_JSON'),
+                        help='Scripted tool call (repeatable)')
+    parser.add_argument('--seed', type=int, help='Random seed')
+    args = parser.parse_args()
+
+    behavior = StubBehavior(
+        latency=args.latency, chunks=args.chunks, chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate, error_status=args.error_status,
+        tool_calls=[(name, json.loads(arguments)) for name, arguments in args.tool_call or ()],
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.behavior = behavior
+    print(f"Stub listening on http://{args.host}:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed {behavior.requests} requests ({behavior.errors} injected errors)")
+
+
+if __name__ == "__main__":
+    main()
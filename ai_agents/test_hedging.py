@@ -0,0 +1,64 @@
+"""
+Hedged requests pick one answer and leave no request running.
+
+Run with: python -m pytest ai_agents
+"""
+import asyncio
+
+from hedging import HedgePolicy
+
+
+def make_policy():
+    # hedge after 10 ms, whatever the (empty) histograms say
+    return HedgePolicy(initial_delay=0.01, min_delay=0.01)
+
+
+def test_primary_wins_when_both_finish_together():
+    policy = make_policy()
+    finished = []
+
+    async def scenario():
+        release = asyncio.get_running_loop().create_future()
+
+        async def attempt(model, backup):
+            await release  # both requests answer in the same loop step
+            finished.append("backup" if backup else "primary")
+            return True, "backup answer" if backup else "primary answer"
+
+        async def answer_both():
+            await asyncio.sleep(0.05)  # well after the backup was sent
+            release.set_result(None)
+
+        asyncio.ensure_future(answer_both())
+        result = await policy.run("gpt-4o", attempt)
+        assert len(asyncio.all_tasks()) == 1  # only this coroutine is left
+        return result
+
+    assert asyncio.run(scenario()) == (True, "primary answer")
+    assert sorted(finished) == ["backup", "primary"]
+    stats = policy.stats()["gpt-4o"]
+    assert (stats["requests"], stats["hedged"], stats["backup_wins"]) == (1, 1, 0)
+
+
+def test_backup_win_cancels_the_primary():
+    policy = make_policy()
+    cancelled = []
+
+    async def scenario():
+        async def attempt(model, backup):
+            if backup:
+                return True, f"{model} answer"
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            return True, "too late"
+
+        result = await policy.run("gpt-4o", attempt)
+        await asyncio.sleep(0)  # let the cancellation reach the primary
+        return result
+
+    assert asyncio.run(scenario()) == (True, "gpt-4o-mini answer")
+    assert cancelled == ["gpt-4o"]
+    assert policy.stats()["gpt-4o"]["backup_wins"] == 1
@@ -0,0 +1,290 @@
+"""
+Memoization for idempotent agent tools.
+
+A tool marked @cacheable answers repeated calls with the same arguments from
+memory instead of running again, for `ttl` seconds. Results are shared
+either within one conversation (scope="session") or by every conversation
+(scope="global"), and each tool keeps at most `maxsize` results, least
+recently used first out. Tools marked @side_effecting (refunds, orders) can
+never be made cacheable, and unmarked tools are never cached.
+
+    @cacheable(ttl=600, scope="global", maxsize=1024)
+    def look_up_item(search_query):
+        ...
+
+The session is whatever `current_session` holds (agent_server and
+openai_agents.main set it to the session id); outside a session each
+run_full_turn is its own session. Hits are counted per turn in
+Response.tool_cache_hits.
+"""
+import collections
+import contextlib
+import contextvars
+import inspect
+import json
+import threading
+import time
+
+SCOPES = ("session", "global")
+
+# Id of the conversation tools are running for; results of scope="session" tools are kept per id
+current_session = contextvars.ContextVar("tool_cache_session", default=None)
+
+# TurnScope of the run_full_turn in progress
+_current_turn = contextvars.ContextVar("tool_cache_turn", default=None)
+
+# Marker set by @side_effecting in place of a CachePolicy
+SIDE_EFFECTS = "side_effects"
+
+
+class CachePolicy:
+    """
+    How a tool's results are cached.
+
+    Args:
+        ttl (float or None): Seconds a result is served for; None keeps it
+            until it is evicted
+        scope (str): "session" or "global"
+        maxsize (int): Results kept for the tool, across all sessions
+    """
+
+    def __init__(self, ttl=300.0, scope="session", maxsize=256):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown cache scope {scope!r}; choose from {SCOPES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.ttl = ttl
+        self.scope = scope
+        self.maxsize = maxsize
+
+
+def cacheable(ttl=300.0, scope="session", maxsize=256):
+    """
+    Mark a tool as a pure lookup whose results can be reused.
+
+    The tool itself is returned unchanged, so its schema stays the same.
+
+    Args:
+        ttl (float or None): Seconds a result is served for
+        scope (str): "session" shares results within a conversation,
+            "global" across all of them
+        maxsize (int): Results kept for the tool
+
+    Raises:
+        ValueError: On an unknown scope, or if the tool is marked @side_effecting
+    """
+    policy = CachePolicy(ttl, scope, maxsize)
+
+    def decorate(func):
+        if getattr(func, "tool_cache_policy", None) is SIDE_EFFECTS:
+            raise ValueError(f"{func.__name__} has side effects and can't be cached")
+        func.tool_cache_policy = policy
+        return func
+
+    return decorate
+
+
+def side_effecting(func):
+    """
+    Mark a tool that changes something (a refund, an order), so it always runs.
+
+    Raises:
+        ValueError: If the tool is already marked @cacheable
+    """
+    if isinstance(getattr(func, "tool_cache_policy", None), CachePolicy):
+        raise ValueError(f"{func.__name__} is marked @cacheable and can't have side effects")
+    func.tool_cache_policy = SIDE_EFFECTS
+    return func
+
+
+def has_side_effects(func):
+    """True if the tool is marked @side_effecting."""
+    return getattr(func, "tool_cache_policy", None) is SIDE_EFFECTS
+
+
+def policy_for(func):
+    """CachePolicy of a tool, or None if its results must not be reused."""
+    policy = getattr(func, "tool_cache_policy", None)
+    return policy if isinstance(policy, CachePolicy) else None
+
+
+class TurnScope:
+    """
+    Tool caching state of one run_full_turn.
+
+    Args:
+        session: Key of the session-scoped results this turn may use
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+
+@contextlib.contextmanager
+def turn():
+    """
+    Scope tool caching to a turn; tool threads started inside inherit it.
+
+    Yields:
+        TurnScope: Its `hits` is the number of cached results served
+    """
+    session = current_session.get()
+    scope = TurnScope(session if session is not None else object())
+    token = _current_turn.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_turn.reset(token)
+
+
+async def _ready(value):
+    return value
+
+
+class ToolCache:
+    """
+    Cached tool results: an LRU per tool, keyed by session (for session
+    scope) and the call's arguments.
+
+    Args:
+        clock (callable): Returns the current time in seconds
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # tool -> OrderedDict of key -> (expires or None, result)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(policy, args, scope):
+        """Cache key for a call, or None when it can't be cached here."""
+        if policy.scope == "session":
+            if scope is None:
+                return None
+            session = scope.session
+        else:
+            session = None
+        try:
+            return session, json.dumps(args, sort_keys=True)
+        except TypeError:
+            return None
+
+    def lookup(self, func, args):
+        """
+        Find a cached result for a tool call.
+
+        Args:
+            func (callable): The tool
+            args (dict): Keyword arguments of the call
+
+        Returns:
+            tuple: (hit, result); for an async tool the result is an awaitable,
+            as calling the tool would return
+        """
+        policy = policy_for(func)
+        if policy is None:
+            return False, None
+        scope = _current_turn.get()
+        key = self._key(policy, args, scope)
+        if key is None:
+            return False, None
+        with self._lock:
+            entries = self._entries.get(func)
+            entry = entries.get(key) if entries else None
+            if entry is not None and (entry[0] is None or entry[0] > self.clock()):
+                entries.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return False, None
+        if scope is not None:
+            scope.hit()
+        result = entry[1]
+        return True, _ready(result) if inspect.iscoroutinefunction(func) else result
+
+    def call(self, func, args):
+        """
+        Run a tool and keep its result if the tool is cacheable.
+
+        Args:
+            func (callable): The tool
+            args (dict): Keyword arguments of the call
+
+        Returns:
+            The tool's result (an awaitable for async tools)
+        """
+        policy = policy_for(func)
+        result = func(**args)
+        if policy is None:
+            return result
+        key = self._key(policy, args, _current_turn.get())
+        if key is None:
+            return result
+        if inspect.isawaitable(result):
+            return self._store_when_done(func, policy, key, result)
+        self._store(func, policy, key, result)
+        return result
+
+    async def _store_when_done(self, func, policy, key, awaitable):
+        result = await awaitable
+        self._store(func, policy, key, result)
+        return result
+
+    def _store(self, func, policy, key, result):
+        expires = None if policy.ttl is None else self.clock() + policy.ttl
+        with self._lock:
+            entries = self._entries.setdefault(func, collections.OrderedDict())
+            entries[key] = (expires, result)
+            entries.move_to_end(key)
+            while len(entries) > policy.maxsize:
+                entries.popitem(last=False)
+
+    def clear(self, session=None):
+        """
+        Drop cached results.
+
+        Args:
+            session (optional): Only drop this session's results
+        """
+        with self._lock:
+            if session is None:
+                self._entries.clear()
+                return
+            for entries in self._entries.values():
+                for key in [key for key in entries if key[0] == session]:
+                    del entries[key]
+
+    def stats(self):
+        """
+        Report cache use.
+
+        Returns:
+            dict: hits, misses and results held per tool name
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": {func.__name__: len(entries) for func, entries in self._entries.items()},
+            }
+
+
+tool_cache = None
+
+
+def get_tool_cache():
+    """Return the process-wide ToolCache, creating it on first use."""
+    global tool_cache
+    if tool_cache is None:
+        tool_cache = ToolCache()
+    return tool_cache
@@ -0,0 +1,249 @@
+"""
+Incremental batch conversion of many PDFs with pdf_to_latex.
+
+A JSON manifest records, for every converted input, its content hash and the
+converter settings used. On the next run, inputs whose hash and settings are
+unchanged (and whose output still exists) are skipped, and the rest are
+converted concurrently.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from pdf_to_latex import pdf_to_latex, converter_settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "pdf_to_latex_manifest.json"
+
+# Seconds between manifest saves while a batch runs, so a crash or interrupt
+# only loses that much finished work
+MANIFEST_SAVE_INTERVAL = 5.0
+
+
+def collect_pdfs(inputs):
+    """
+    Expand files, directories (searched recursively) and glob patterns into PDFs.
+
+    Args:
+        inputs (list): Paths, directories or glob patterns
+
+    Returns:
+        tuple: (pdfs, unmatched). pdfs is a sorted, de-duplicated list of
+        (pdf_path, relative_path) tuples; the relative path is what the output
+        layout mirrors. PDFs in a directory are relative to that directory, and
+        files and glob matches to their common parent directory. unmatched
+        lists the inputs that found no PDF.
+    """
+    found = {}
+    loose = []  # files and glob matches
+    unmatched = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = 0
+            for pdf in path.rglob("*"):
+                if pdf.is_file() and pdf.suffix.lower() == ".pdf":
+                    found.setdefault(pdf.resolve(), pdf.relative_to(path))
+                    matches += 1
+        elif path.is_file():
+            loose.append(path.resolve())
+            matches = 1
+        else:
+            matches = 0
+            for match in glob.glob(item, recursive=True):
+                match = Path(match)
+                if match.is_file() and match.suffix.lower() == ".pdf":
+                    loose.append(match.resolve())
+                    matches += 1
+        if not matches:
+            unmatched.append(item)
+
+    if loose:
+        # a/x.pdf and b/x.pdf become a/x and b/x rather than both x
+        root = Path(os.path.commonpath([str(pdf.parent) for pdf in loose]))
+        for pdf in loose:
+            found.setdefault(pdf, pdf.relative_to(root))
+    return sorted(found.items()), unmatched
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """Load a manifest, or return an empty one if it is missing or unreadable."""
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("entries"), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": 1, "entries": {}}
+
+
+def save_manifest(manifest, manifest_path):
+    """Write a manifest atomically so an interrupted run never leaves it half-written."""
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _fingerprint(pdf_path, entry):
+    """
+    Content hash of an input, reusing the manifest's hash when size and mtime match.
+
+    Returns:
+        dict: sha256, size and mtime_ns of the file
+    """
+    stat = pdf_path.stat()
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        sha256 = entry["sha256"]
+    else:
+        sha256 = file_sha256(pdf_path)
+    return {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _convert_one(pdf_path, output_path, options):
+    stats = Counter()
+    success, message, written = pdf_to_latex(pdf_path, output_path, stats=stats, **options)
+    return success, message, written, stats
+
+
+def convert_batch(inputs, output_dir=None, manifest_path=None, jobs=None, force=False, **options):
+    """
+    Convert every PDF under the given inputs that changed since the last run.
+
+    Args:
+        inputs (list): Paths, directories or glob patterns
+        output_dir (str, optional): Directory for .tex files (mirrors input layout).
+            If None, each .tex file is written next to its PDF
+        manifest_path (str, optional): Manifest location. Defaults to
+            MANIFEST_NAME in output_dir, or the current directory
+        jobs (int, optional): Files converted concurrently (default: CPU count)
+        force (bool): Convert everything, ignoring the manifest
+        **options: Extra pdf_to_latex keyword arguments (e.g. stream=True, or
+            page_cache as a path so every worker shares one cache file)
+
+    Returns:
+        dict: Machine-readable summary with converted, skipped and failed inputs
+        and how many converted pages ran or skipped table detection or were
+        reused from the page cache
+    """
+    started = time.perf_counter()
+    if manifest_path is None:
+        manifest_path = Path(output_dir or ".") / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    entries = manifest["entries"]
+    settings = converter_settings(**options)
+
+    summary = {"converted": [], "skipped": [], "failed": []}
+    page_stats = Counter()
+    pending = []
+    pdfs, unmatched = collect_pdfs(inputs)
+    for item in unmatched:
+        summary["failed"].append({"input": item, "error": "No PDF files found"})
+
+    targets = {}  # output path -> inputs that would write it
+    for pdf_path, relative_path in pdfs:
+        if output_dir is None:
+            output_path = pdf_path.with_suffix(".tex")
+        else:
+            output_path = Path(output_dir).resolve() / relative_path.with_suffix(".tex")
+        targets.setdefault(output_path, []).append(pdf_path)
+
+    for output_path, pdf_paths in targets.items():
+        if len(pdf_paths) > 1:
+            # e.g. a directory input and a file input that both map to x.tex
+            for pdf_path in pdf_paths:
+                entries.pop(str(pdf_path), None)
+                summary["failed"].append({
+                    "input": str(pdf_path),
+                    "error": f"Output {output_path} would also be written by "
+                             + ", ".join(str(other) for other in pdf_paths if other != pdf_path),
+                })
+            continue
+        pdf_path = pdf_paths[0]
+
+        key = str(pdf_path)
+        entry = entries.get(key)
+        try:
+            fingerprint = _fingerprint(pdf_path, entry)
+        except OSError as e:
+            summary["failed"].append({"input": key, "error": str(e)})
+            continue
+
+        up_to_date = (
+            not force
+            and entry is not None
+            and entry["sha256"] == fingerprint["sha256"]
+            and entry.get("settings") == settings
+            and entry.get("output") == str(output_path)
+            and output_path.exists()
+        )
+        if up_to_date:
+            entry.update(fingerprint)  # keep the mtime fast path current after a touch
+            summary["skipped"].append({"input": key, "output": str(output_path)})
+        else:
+            pending.append((key, output_path, fingerprint))
+
+    try:
+        if pending:
+            for _, output_path, _ in pending:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+            last_save = time.monotonic()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {
+                    executor.submit(_convert_one, key, str(output_path), options): (key, fingerprint)
+                    for key, output_path, fingerprint in pending
+                }
+                for future in as_completed(futures):
+                    key, fingerprint = futures[future]
+                    try:
+                        success, message, written, stats = future.result()
+                    except Exception as e:  # e.g. BrokenProcessPool when a worker crashed
+                        success, message = False, f"Conversion process failed: {e!r}"
+                    else:
+                        page_stats.update(stats)
+                    if success:
+                        entries[key] = dict(fingerprint, settings=settings, output=written)
+                        summary["converted"].append({"input": key, "output": written})
+                    else:
+                        entries.pop(key, None)
+                        summary["failed"].append({"input": key, "error": message})
+                    if time.monotonic() - last_save >= MANIFEST_SAVE_INTERVAL:
+                        save_manifest(manifest, manifest_path)
+                        last_save = time.monotonic()
+    finally:
+        if pdfs:  # nothing found means nothing to record
+            save_manifest(manifest, manifest_path)
+
+    summary["counts"] = {name: len(summary[name]) for name in ("converted", "skipped", "failed")}
+    summary["pages"] = {
+        "table_detection": page_stats["table_detection_pages"],
+        "text_only": page_stats["text_only_pages"],
+        "cached": page_stats["cached_pages"],
+    }
+    summary["manifest"] = str(manifest_path)
+    summary["settings"] = settings
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Batch done: %(converted)d converted, %(skipped)d skipped, %(failed)d failed",
+        summary["counts"],
+    )
+    return summary
@@ -0,0 +1,478 @@
+"""
+Benchmarks for pdf_to_latex on deterministic synthetic PDFs.
+
+Usage:
+    python bench_pdf_to_latex.py throughput [--pages 20] [--repeat 3]
+    python bench_pdf_to_latex.py memory [--pages 10 40] [--max-growth 1.5]
+    python bench_pdf_to_latex.py normalize [--pages 20] [--repeat 5]
+    python bench_pdf_to_latex.py suite [--pages 20] [--many-pages 100] [--repeat 3]
+        [--save-baseline FILE] [--baseline FILE] [--threshold 0.10]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pdfplumber
+
+from pdf_to_latex import pdf_to_latex, normalize_text, clean_text, escape_latex, _HEADER, _HEADER_MAX_LENGTH
+from stage_profiler import StageProfiler, STAGES
+from synthetic_pdfs import make_pdf, WORDS
+
+# Keep per-file "Successfully converted" messages out of the report
+logging.getLogger('pdf_to_latex').setLevel(logging.WARNING)
+
+CORPUS_SHAPES = ("text", "table", "mixed")
+
+# Suite documents: page kinds cycled over the document's pages
+SUITE_SHAPES = {
+    "text": ("text",),
+    "table": ("table",),
+    "mixed": ("mixed",),
+    "many-pages": ("text", "table", "mixed"),
+}
+
+# Suite metrics compared against a baseline, and whether bigger is better
+SUITE_METRICS = {
+    "pages_per_second": True,
+    "clean_text_mb_per_second": True,
+    "peak_rss_mb": False,
+}
+
+
+def peak_memory(pdf_path, output_path, **options):
+    """
+    Convert a PDF under tracemalloc.
+
+    Args:
+        pdf_path (Path): Input PDF
+        output_path (Path): Output .tex file
+        **options: Extra pdf_to_latex keyword arguments
+
+    Returns:
+        int: Peak traced memory in bytes
+    """
+    tracemalloc.start()
+    try:
+        success, message, _ = pdf_to_latex(pdf_path, output_path, **options)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if not success:
+        raise RuntimeError(message)
+    return peak
+
+
+def warm_up(directory):
+    """
+    Convert a small document once, so one-time allocations (imports, compiled
+    patterns, font caches) don't count toward the first measured peak.
+
+    Args:
+        directory (Path): Where to write the throwaway files
+    """
+    pdf_path = make_pdf(directory / "warm_up.pdf", ["mixed"] * 2)
+    pdf_to_latex(pdf_path, directory / "warm_up.tex", stream=True)
+
+
+def bench_throughput(pages, repeat):
+    """
+    Report pages per second for each document shape.
+
+    Args:
+        pages (int): Pages per synthetic document
+        repeat (int): Conversions per document; the fastest is reported
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        total_pages = total_seconds = 0
+        print(f"{'shape':<8}{'pages':>7}{'best (s)':>10}{'pages/s':>10}")
+        for shape in CORPUS_SHAPES:
+            pdf_path = make_pdf(tmp / f"{shape}.pdf", [shape] * pages)
+            times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                success, message, _ = pdf_to_latex(pdf_path, tmp / f"{shape}.tex")
+                times.append(time.perf_counter() - started)
+                if not success:
+                    raise RuntimeError(message)
+            best = min(times)
+            total_pages += pages
+            total_seconds += best
+            print(f"{shape:<8}{pages:>7}{best:>10.3f}{pages / best:>10.1f}")
+        print(f"{'all':<8}{total_pages:>7}{total_seconds:>10.3f}{total_pages / total_seconds:>10.1f}")
+
+
+def bench_memory(page_counts, max_growth):
+    """
+    Check that streaming conversion keeps peak memory flat as documents grow.
+
+    Args:
+        page_counts (list): Document sizes to compare, smallest first
+        max_growth (float): Largest allowed peak ratio between the biggest and smallest document
+
+    Returns:
+        bool: True if peak memory stayed within max_growth
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        warm_up(tmp)
+        peaks = []
+        for pages in page_counts:
+            pdf_path = make_pdf(tmp / f"mixed_{pages}.pdf", ["mixed"] * pages)
+            peak = peak_memory(pdf_path, tmp / f"mixed_{pages}.tex", stream=True)
+            peaks.append(peak)
+            print(f"{pages:>6} pages: peak {peak / 1e6:8.2f} MB")
+
+    growth = peaks[-1] / peaks[0]
+    ok = growth <= max_growth
+    print(f"growth {growth:.2f}x over {page_counts[-1] / page_counts[0]:.0f}x pages "
+          f"({'ok' if ok else 'FAIL'}, limit {max_growth:.2f}x)")
+    return ok
+
+
+def legacy_normalize(text):
+    """The multi-pass clean_text and per-line header match used before normalize_text."""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    blocks = []
+    for section in text.strip().split('\n'):
+        if re.match(r'^[0-9.]*\s*[A-Z][^.!?]*$', section.strip()):
+            blocks.append(("section", section.strip()))
+        else:
+            blocks.append(("paragraph", section.replace('_', '\\_').replace('%', '\\%')))
+    return blocks
+
+
+# Passes of multipass_normalize
+_SPACE_RUN = re.compile(r'[^\S\n]+')
+_PAGE_NUMBER_LINE = re.compile(r'^ ?\d+ ?\n', re.MULTILINE)
+_HYPHEN_JOIN = re.compile(r'(\w)-\n(?=\w)')
+
+
+def multipass_normalize(text):
+    """
+    normalize_text's output from whole-text regex passes plus a line loop for
+    the headers: the straightforward correct version, to check that the single
+    pass pays for its extra logic.
+    """
+    text = _SPACE_RUN.sub(' ', text + '\n')
+    text = _PAGE_NUMBER_LINE.sub('', text)
+    text = _HYPHEN_JOIN.sub(r'\1', text)
+    blocks = []
+    paragraph = []
+    for line in text.split('\n'):
+        line = line.strip(' ')
+        if not line:
+            if paragraph:
+                blocks.append(("paragraph", ' '.join(paragraph)))
+                paragraph = []
+        elif (len(line) <= _HEADER_MAX_LENGTH and not line.endswith('-') and _HEADER.fullmatch(line)
+                and (not paragraph or paragraph[-1][-1] in '.!?:')):
+            if paragraph:
+                blocks.append(("paragraph", ' '.join(paragraph)))
+                paragraph = []
+            blocks.append(("section", line))
+        else:
+            paragraph.append(line)
+    if paragraph:
+        blocks.append(("paragraph", ' '.join(paragraph)))
+    return [(kind, escape_latex(block)) for kind, block in blocks]
+
+
+def synthetic_text(size, seed=0):
+    """
+    Page-like raw text: headings, wrapped prose with hyphen breaks and page numbers.
+
+    Args:
+        size (int): Approximate length in characters
+        seed (int): Random seed
+
+    Returns:
+        str: The text
+    """
+    rng = random.Random(seed)
+    lines, length, number = [], 0, 0
+    while length < size:
+        number += 1
+        chunk = [f"{number}. {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"]
+        for _ in range(rng.randint(20, 40)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 14))]
+            if rng.random() < 0.2:
+                word = words[-1]
+                words[-1] = word[:len(word) // 2] + "-"
+                chunk.append("  ".join(words))
+                chunk.append(word[len(word) // 2:] + " 50% of item_" + str(number))
+            else:
+                chunk.append(" ".join(words).capitalize() + ".")
+        chunk.extend(["", str(number), ""])
+        lines.extend(chunk)
+        length += sum(len(line) + 1 for line in chunk)
+    return "\n".join(lines)
+
+
+def _seconds_per_text(normalize, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            normalize(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts)
+
+
+def bench_normalize(pages, repeat):
+    """
+    Time text normalization per page against the passes it replaced.
+
+    Runs on the text of real (synthetic) PDF pages and on generated page text
+    with headings, hyphen breaks and page numbers. The old passes are timed as
+    they were, although their output differs (they lose the line structure);
+    multipass_normalize must match normalize_text exactly. Page conversion
+    time is reported alongside, for each step's share of it.
+
+    Args:
+        pages (int): Pages per document (a text and a mixed one)
+        repeat (int): Runs per implementation; the fastest is reported
+    """
+    texts = []
+    convert_seconds = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for kind in ("text", "mixed"):
+            pdf_path = make_pdf(tmp / f"{kind}.pdf", [kind] * pages)
+            started = time.perf_counter()
+            pdf_to_latex(pdf_path, tmp / f"{kind}.tex")
+            convert_seconds += time.perf_counter() - started
+            with pdfplumber.open(pdf_path) as pdf:
+                texts.extend(page.extract_text() or "" for page in pdf.pages)
+    per_page = convert_seconds / len(texts)
+    size = sum(map(len, texts)) // len(texts)
+    corpora = {
+        "pdf pages": texts,
+        "generated": [synthetic_text(size, seed) for seed in range(len(texts))],
+    }
+
+    print(f"page conversion: {per_page * 1e3:.1f} ms/page; page text: {size} characters on average")
+    print(f"{'corpus':<11}{'implementation':<16}{'us/page':>9}{'of page':>9}")
+    for corpus, page_texts in corpora.items():
+        expected = [normalize_text(text) for text in page_texts]
+        if [multipass_normalize(text) for text in page_texts] != expected:
+            raise AssertionError(f"multipass_normalize differs from normalize_text on {corpus}")
+        results = {}
+        for name, normalize in (("legacy", legacy_normalize), ("multipass", multipass_normalize),
+                                ("normalize_text", normalize_text)):
+            seconds = _seconds_per_text(normalize, page_texts, repeat)
+            results[name] = seconds
+            print(f"{corpus:<11}{name:<16}{seconds * 1e6:>9.1f}{seconds / per_page:>9.2%}")
+        print(f"{'':<11}speedup {results['legacy'] / results['normalize_text']:.2f}x over legacy, "
+              f"{results['multipass'] / results['normalize_text']:.2f}x over multipass")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run_shape(pdf_path, repeat):
+    """
+    Measure one suite document. Runs in a fresh process so peak RSS is its own.
+
+    Args:
+        pdf_path (str): Synthetic PDF to convert
+        repeat (int): Timed conversions; the fastest is reported
+
+    Returns:
+        dict: pages, best_seconds, pages_per_second, clean_text_mb_per_second,
+        peak_rss_mb and stages (milliseconds per page for each stage)
+    """
+    output_path = Path(pdf_path).with_suffix(".tex")
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        success, message, _ = pdf_to_latex(pdf_path, output_path)
+        times.append(time.perf_counter() - started)
+        if not success:
+            raise RuntimeError(message)
+    peak_rss = _peak_rss_mb()
+
+    # One more run, profiled, for the per-stage breakdown
+    profiler = StageProfiler(trace_memory=False)
+    pdf_to_latex(pdf_path, output_path, profiler=profiler)
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        texts = [page.extract_text() or "" for page in pdf.pages]
+    text_mb = sum(len(text) for text in texts) / 1e6
+    clean_times = []
+    for _ in range(max(repeat, 5)):
+        started = time.perf_counter()
+        for text in texts:
+            clean_text(text)
+        clean_times.append(time.perf_counter() - started)
+
+    best = min(times)
+    return {
+        "pages": page_count,
+        "best_seconds": round(best, 4),
+        "pages_per_second": round(page_count / best, 2),
+        "clean_text_mb_per_second": round(text_mb / min(clean_times), 2),
+        "peak_rss_mb": round(peak_rss, 1),
+        "stages": {
+            name: round(stage["seconds"] / page_count * 1000, 3)
+            for name, stage in profiler.to_dict()["stages"].items()
+        },
+    }
+
+
+def run_suite(pages, many_pages, repeat):
+    """
+    Build the synthetic corpus and measure every shape in its own process.
+
+    Args:
+        pages (int): Pages in the text, table and mixed documents
+        many_pages (int): Pages in the many-pages document
+        repeat (int): Timed conversions per document
+
+    Returns:
+        dict: Suite results, suitable for saving as a baseline
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {
+        "config": {"pages": pages, "many_pages": many_pages, "repeat": repeat},
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "shapes": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape, kinds in SUITE_SHAPES.items():
+            count = many_pages if shape == "many-pages" else pages
+            pdf_path = make_pdf(Path(tmp) / f"{shape}.pdf", [kinds[i % len(kinds)] for i in range(count)])
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results["shapes"][shape] = executor.submit(run_shape, str(pdf_path), repeat).result()
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Find metrics that got worse than the baseline by more than threshold.
+
+    Args:
+        results (dict): Current run_suite results
+        baseline (dict): Earlier run_suite results
+        threshold (float): Allowed relative change, e.g. 0.10 for 10%
+
+    Returns:
+        list: Description of each regression
+    """
+    regressions = []
+    for shape, current in results["shapes"].items():
+        previous = baseline.get("shapes", {}).get(shape)
+        if previous is None:
+            continue
+        for metric, higher_is_better in SUITE_METRICS.items():
+            if not previous.get(metric):
+                continue
+            change = current[metric] / previous[metric] - 1
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{shape}: {metric} {previous[metric]} -> {current[metric]} ({change:+.1%})"
+                )
+    return regressions
+
+
+def print_suite(results, baseline=None):
+    """Print suite results, with the relative change against a baseline if given."""
+    print(f"{'shape':<12}{'pages':>7}{'pages/s':>10}{'clean MB/s':>12}{'peak RSS MB':>13}")
+    for shape, result in results["shapes"].items():
+        line = (f"{shape:<12}{result['pages']:>7}{result['pages_per_second']:>10.1f}"
+                f"{result['clean_text_mb_per_second']:>12.1f}{result['peak_rss_mb']:>13.1f}")
+        previous = (baseline or {}).get("shapes", {}).get(shape)
+        if previous:
+            changes = [
+                f"{result[metric] / previous[metric] - 1:+.1%}" if previous.get(metric) else "n/a"
+                for metric in SUITE_METRICS
+            ]
+            line += "   vs baseline " + " / ".join(changes)
+        print(line)
+
+    print()
+    print("ms per page by stage:")
+    seen = {name for result in results["shapes"].values() for name in result["stages"]}
+    names = [name for name in STAGES if name in seen] + sorted(seen - set(STAGES))
+    print(f"{'shape':<12}" + "".join(f"{name[:13]:>14}" for name in names))
+    for shape, result in results["shapes"].items():
+        print(f"{shape:<12}" + "".join(f"{result['stages'].get(name, 0):>14.2f}" for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pdf_to_latex benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    throughput = commands.add_parser('throughput', help='Pages per second by document shape')
+    throughput.add_argument('--pages', type=int, default=20, help='Pages per document')
+    throughput.add_argument('--repeat', type=int, default=3, help='Runs per document (best is reported)')
+
+    memory = commands.add_parser('memory', help='Peak memory of streaming conversion vs. page count')
+    memory.add_argument('--pages', type=int, nargs='+', default=[10, 40], help='Document sizes to compare')
+    memory.add_argument('--max-growth', type=float, default=1.5, help='Allowed peak memory growth')
+
+    normalize = commands.add_parser('normalize', help='Text normalization time per page vs. multi-pass versions')
+    normalize.add_argument('--pages', type=int, default=20, help='Pages per document')
+    normalize.add_argument('--repeat', type=int, default=5, help='Runs per implementation (best is reported)')
+
+    suite = commands.add_parser('suite', help='Full suite on the synthetic corpus, with baseline comparison')
+    suite.add_argument('--pages', type=int, default=20, help='Pages in the text, table and mixed documents')
+    suite.add_argument('--many-pages', type=int, default=100, help='Pages in the many-pages document')
+    suite.add_argument('--repeat', type=int, default=3, help='Runs per document (best is reported)')
+    suite.add_argument('--save-baseline', metavar='FILE', help='Write the results here as the new baseline')
+    suite.add_argument('--baseline', metavar='FILE', help='Compare against this baseline; exit 1 on regression')
+    suite.add_argument('--threshold', type=float, default=0.10,
+                       help='Relative change counted as a regression (default: 0.10)')
+
+    args = parser.parse_args()
+
+    if args.command == 'throughput':
+        bench_throughput(args.pages, args.repeat)
+    elif args.command == 'memory':
+        ok = bench_memory(sorted(args.pages), args.max_growth)
+        sys.exit(0 if ok else 1)
+    elif args.command == 'normalize':
+        bench_normalize(args.pages, args.repeat)
+    elif args.command == 'suite':
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        results = run_suite(args.pages, args.many_pages, args.repeat)
+        print_suite(results, baseline)
+
+        if args.save_baseline:
+            with open(args.save_baseline, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nbaseline written to {args.save_baseline}")
+        if baseline is not None:
+            if baseline.get("config") != results["config"]:
+                print(f"\nwarning: baseline config {baseline.get('config')} differs from {results['config']}")
+            regressions = compare_to_baseline(results, baseline, args.threshold)
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Per-page cache of converted LaTeX fragments.
+
+A page is identified by a hash of what it draws: its content streams, the
+resources they use (fonts, images, forms) and its page boxes. Combined with
+the converter settings, that hash keys the page's LaTeX lines, so when a
+revised document is converted again only the pages that changed are
+extracted. Entries live in a SQLite file; once it grows past max_bytes the
+least recently used pages are evicted.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSLiteral, PSKeyword
+
+DEFAULT_PAGE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "suits_pdf", "pages.sqlite3"
+)
+
+# Page attributes that change what ends up on the page
+_PAGE_FIELDS = ("MediaBox", "CropBox", "Rotate")
+
+
+def _feed(digest, value, memo, seen):
+    """Hash a PDF object, following references and hashing encoded stream data."""
+    if isinstance(value, PDFObjRef):
+        objid = value.objid
+        if objid in seen:  # reference cycle, e.g. a Parent link
+            digest.update(b"C%d" % objid)
+            return
+        if objid not in memo:
+            sub = hashlib.sha256()
+            _feed(sub, value.resolve(), memo, seen | {objid})
+            memo[objid] = sub.digest()
+        digest.update(b"R" + memo[objid])
+    elif isinstance(value, PDFStream):
+        _feed(digest, value.attrs, memo, seen)  # includes /Filter and /DecodeParms
+        # The still-encoded bytes identify the content just as well, without
+        # inflating every image of a scanned page. A stream that was already
+        # decoded has no raw bytes left; its data hashes differently, which
+        # at worst costs a cache miss.
+        raw = value.get_rawdata()
+        if raw is not None:
+            digest.update(b"S" + hashlib.sha256(raw).digest())
+        else:
+            digest.update(b"s" + hashlib.sha256(value.get_data()).digest())
+    elif isinstance(value, dict):
+        digest.update(b"D%d" % len(value))
+        for key in sorted(value):
+            digest.update(str(key).encode("utf-8") + b"=")
+            _feed(digest, value[key], memo, seen)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"L%d" % len(value))
+        for item in value:
+            _feed(digest, item, memo, seen)
+    elif isinstance(value, (bytes, bytearray)):
+        digest.update(b"B%d:" % len(value) + bytes(value))
+    elif isinstance(value, (PSLiteral, PSKeyword)):
+        digest.update(b"N" + repr(value.name).encode("utf-8"))
+    else:
+        digest.update(b"V" + repr(value).encode("utf-8"))
+
+
+def page_fingerprint(page, memo=None):
+    """
+    Hash everything that determines how a page renders, without parsing its layout.
+
+    Args:
+        page (pdfplumber.page.Page): Page to fingerprint
+        memo (dict, optional): Digests of already hashed objects, keyed by object id.
+            Share one per document so fonts used on every page are hashed once
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    if memo is None:
+        memo = {}
+    page_obj = page.page_obj
+    digest = hashlib.sha256()
+    for field in _PAGE_FIELDS:
+        _feed(digest, page_obj.attrs.get(field), memo, frozenset())
+    _feed(digest, page_obj.resources, memo, frozenset())
+    for stream in page_obj.contents:
+        _feed(digest, stream, memo, frozenset())
+    return digest.hexdigest()
+
+
+def make_page_key(fingerprint, settings):
+    """
+    Cache key for one page under the given converter settings.
+
+    Args:
+        fingerprint (str): Digest from page_fingerprint
+        settings (dict): Output-affecting settings, from converter_settings
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    blob = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{fingerprint}:{blob}".encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """
+    SQLite-backed store of page fragments with size-bounded LRU eviction.
+
+    Several processes may share one file (page-parallel and batch conversion
+    each open it in every worker).
+    """
+
+    def __init__(self, path=DEFAULT_PAGE_CACHE_PATH, max_bytes=256 * 1024 * 1024):
+        import sqlite3
+
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY, lines TEXT NOT NULL, size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._total_bytes = self._disk_bytes()
+
+    def get(self, key):
+        """
+        Look up a page's LaTeX lines.
+
+        Args:
+            key (str): Key from make_page_key
+
+        Returns:
+            list or None: The cached lines, or None on a miss
+        """
+        with self._lock:
+            row = self._db.execute("SELECT lines FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._stats["hits"] += 1
+            return json.loads(row[0])
+
+    def set(self, key, lines):
+        """
+        Store a page's LaTeX lines, evicting least recently used pages if over max_bytes.
+
+        Args:
+            key (str): Key from make_page_key
+            lines (list): LaTeX lines for the page
+        """
+        value = json.dumps(lines, ensure_ascii=False)
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (key, lines, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Drop every cached page."""
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: hits, misses and evictions in this process, plus entries and bytes on disk
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            return dict(self._stats, entries=entries, bytes=self._disk_bytes())
+
+    def close(self):
+        """Close the underlying database."""
+        self._db.close()
+
+    def _disk_bytes(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _evict(self):
+        # The running total is only an estimate when other processes share the
+        # file (or a key was overwritten), so recount before evicting
+        self._total_bytes = self._disk_bytes()
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM pages ORDER BY last_access ASC"):
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM pages WHERE key = ?", victims)
+        self._total_bytes = self._disk_bytes()
+        self._stats["evictions"] += len(victims)
@@ -1,11 +1,134 @@
 import pdfplumber
+import gc
+import os
 import re
 from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import logging
 
+from page_cache import PageCache, page_fingerprint, make_page_key, DEFAULT_PAGE_CACHE_PATH
+from stage_profiler import StageProfiler, NULL_PROFILER
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LATEX_PREAMBLE = [
+    "\\documentclass{article}",
+    "\\usepackage[utf8]{inputenc}",
+    "\\usepackage{amsmath}",
+    "\\usepackage{graphicx}",
+    "\\begin{document}",
+]
+LATEX_END = "\\end{document}"
+
+# Bump whenever a change alters the generated LaTeX, so incremental batch runs
+# know to redo outputs produced by older versions.
+CONVERTER_VERSION = 3
+
+# pdf_to_latex options that change how the work is done but not its output
+_EXECUTION_OPTIONS = ("workers", "stream", "page_cache")
+
+# Parsed pages between garbage collections when streaming. pdfplumber's layout
+# objects reference each other and are only freed by a collection, which
+# otherwise comes late enough for dozens of pages' worth to pile up; collecting
+# after every page would cost about 7 ms a page
+STREAM_COLLECT_EVERY = 4
+
+def converter_settings(**options):
+    """
+    Settings that determine the generated LaTeX, used for change detection.
+    
+    Args:
+        **options: pdf_to_latex keyword arguments
+        
+    Returns:
+        dict: Converter version plus every output-affecting option
+    """
+    settings = {"converter_version": CONVERTER_VERSION}
+    settings.update({k: v for k, v in options.items() if k not in _EXECUTION_OPTIONS})
+    return settings
+
+# Section headers: optional numbering, a capital letter, no sentence punctuation
+_HEADER = re.compile(r'[0-9.]*\s*[A-Z][^.!?]*')
+_HEADER_MAX_LENGTH = 60
+
+# A line ending in a word broken across lines, e.g. "conver-"
+_HYPHEN_BREAK = re.compile(r'\w-$')
+
+_LATEX_ESCAPES = {
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+}
+_LATEX_SPECIAL = re.compile('[' + re.escape(''.join(_LATEX_ESCAPES)) + ']')
+
+def _escape_match(match):
+    return _LATEX_ESCAPES[match.group()]
+
+def escape_latex(text):
+    """Escape LaTeX special characters in plain text."""
+    return _LATEX_SPECIAL.sub(_escape_match, text)
+
+def normalize_text(text, escape=True):
+    """
+    Turn raw extracted page text into section and paragraph blocks in one pass.
+    
+    Walking the lines once, this collapses whitespace, drops lines that are
+    just a page number, re-joins words hyphenated across line breaks, classifies
+    short capitalized lines without sentence punctuation as section headers,
+    and joins the remaining lines into paragraphs (blank lines separate them).
+    
+    Args:
+        text (str): Raw text extracted from PDF
+        escape (bool): Escape LaTeX special characters in the output
+        
+    Returns:
+        list: (kind, text) tuples where kind is "section" or "paragraph"
+    """
+    blocks = []
+    paragraph = []
+
+    for raw_line in text.split('\n'):
+        line = ' '.join(raw_line.split())
+        if not line:
+            if paragraph:
+                blocks.append(("paragraph", ' '.join(paragraph)))
+                paragraph = []
+            continue
+        if line.isdigit():
+            continue  # page number
+
+        if (paragraph and paragraph[-1].endswith('-') and _HYPHEN_BREAK.search(paragraph[-1])
+                and (line[0].isalnum() or line[0] == '_')):
+            paragraph[-1] = paragraph[-1][:-1] + line
+            continue
+
+        # A header stands on its own: not in the middle of a sentence
+        if (len(line) <= _HEADER_MAX_LENGTH and not line.endswith('-') and _HEADER.fullmatch(line)
+                and (not paragraph or paragraph[-1][-1] in '.!?:')):
+            if paragraph:
+                blocks.append(("paragraph", ' '.join(paragraph)))
+                paragraph = []
+            blocks.append(("section", line))
+            continue
+
+        paragraph.append(line)
+
+    if paragraph:
+        blocks.append(("paragraph", ' '.join(paragraph)))
+
+    if escape:
+        blocks = [(kind, escape_latex(block)) for kind, block in blocks]
+    return blocks
+
 def clean_text(text):
     """
     Clean extracted text by handling common PDF extraction artifacts.
@@ -14,30 +137,367 @@ def clean_text(text):
         text (str): Raw text extracted from PDF
         
     Returns:
-        str: Cleaned text
+        str: Cleaned text, one header or paragraph per line
+    """
+    return '\n'.join(block for _, block in normalize_text(text, escape=False))
+
+def _outside_regions(bboxes):
+    """Build a page.filter predicate keeping objects whose center lies outside every bbox."""
+    def keep(obj):
+        x = (obj["x0"] + obj["x1"]) / 2
+        y = (obj["top"] + obj["bottom"]) / 2
+        return not any(x0 <= x <= x1 and top <= y <= bottom for x0, top, x1, bottom in bboxes)
+    return keep
+
+# How sure the pre-check must be that a page has no tables before skipping detection:
+#   always     - never skip, run table detection on every page
+#   strict     - skip only pages with no ruling lines or rectangles at all
+#   balanced   - also skip pages whose edges cannot form a single cell (<2 horizontal or vertical)
+#   aggressive - also skip pages with less than a 2x2 grid or no column-aligned text
+# strict and balanced never change the output with pdfplumber's default
+# line-based table settings; aggressive trades some recall for speed.
+TABLE_DETECTION_MODES = ("always", "strict", "balanced", "aggressive")
+
+def _has_column_alignment(chars, min_rows=3, min_columns=2):
     """
-    # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text)
+    Check whether text lines up in columns, as table cells do.
     
-    # Handle hyphenated words at line breaks
-    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    A column start is a character preceded by a gap wider than its font size.
+    Prose only ever starts at the left margin; tables repeat several starts
+    across rows.
+    """
+    rows = {}
+    for char in chars:
+        rows.setdefault(round(char["top"]), []).append(char)
+
+    starts = Counter()
+    for row in rows.values():
+        row.sort(key=lambda c: c["x0"])
+        prev_x1 = None
+        for char in row:
+            if prev_x1 is None or char["x0"] - prev_x1 > char["size"]:
+                starts[round(char["x0"])] += 1
+            prev_x1 = char["x1"]
+    return sum(1 for count in starts.values() if count >= min_rows) >= min_columns
+
+def needs_table_detection(page, strictness="balanced"):
+    """
+    Cheap pre-check deciding whether a page can contain tables.
     
-    # Remove isolated numbers that might be page numbers
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    Args:
+        page (pdfplumber.page.Page): Page to check
+        strictness (str): One of TABLE_DETECTION_MODES
+        
+    Returns:
+        bool: False if the page clearly has no tables and extract can be skipped
+    """
+    if strictness == "always":
+        return True
+    if strictness not in TABLE_DETECTION_MODES:
+        raise ValueError(f"Unknown table detection mode: {strictness}")
+
+    horizontal = len(page.horizontal_edges)
+    vertical = len(page.vertical_edges)
+    if strictness == "strict":
+        return horizontal > 0 or vertical > 0
+    if strictness == "balanced":
+        return horizontal >= 2 and vertical >= 2
+    return horizontal >= 3 and vertical >= 3 and _has_column_alignment(page.chars)
+
+def page_to_latex(page, table_detection="balanced", stats=None, profiler=NULL_PROFILER):
+    """
+    Convert a single PDF page to LaTeX.
     
-    return text.strip()
+    Tables are located first and text is taken only from outside them, so
+    table contents appear once (as a tabular) and both steps share the
+    page's parsed objects.
+    
+    Args:
+        page (pdfplumber.page.Page): Page to convert
+        table_detection (str): Pre-check strictness, one of TABLE_DETECTION_MODES
+        stats (Counter, optional): Incremented with the path the page took
+            ("table_detection_pages" or "text_only_pages")
+        profiler (StageProfiler, optional): Records time and allocations per stage
+        
+    Returns:
+        list: LaTeX lines for the page, in output order
+    """
+    latex_content = []
+
+    if profiler.enabled:
+        # Parse the page's objects up front so the stages below time only their own work
+        with profiler.stage("parse"):
+            page.objects
 
-def pdf_to_latex(pdf_path, output_path=None):
+    # Find table regions, then extract text from the rest of the page
+    with profiler.stage("find_tables"):
+        if needs_table_detection(page, table_detection):
+            found = page.find_tables()
+            path = "table_detection_pages"
+        else:
+            found = []
+            path = "text_only_pages"
+    if stats is not None:
+        stats[path] += 1
+
+    with profiler.stage("extract_text"):
+        if found:
+            text = page.filter(_outside_regions([table.bbox for table in found])).extract_text()
+        else:
+            text = page.extract_text()
+    with profiler.stage("extract_tables"):
+        tables = [table.extract() for table in found]
+    
+    if text:
+        with profiler.stage("clean_text"):
+            blocks = normalize_text(text)
+        with profiler.stage("sections"):
+            for kind, block in blocks:
+                if kind == "section":
+                    latex_content.append(f"\n\\section{{{block}}}")
+                else:
+                    # Regular paragraph
+                    latex_content.append(f"\n{block}")
+    
+    # Convert tables to LaTeX format
+    if tables:
+        with profiler.stage("render_tables"):
+            for table in tables:
+                if table:
+                    latex_content.append("\\begin{table}[h!]")
+                    latex_content.append("\\begin{tabular}{" + "l" * len(table[0]) + "}")
+                    
+                    for row in table:
+                        # Clean and escape special characters
+                        cleaned_row = [escape_latex(str(cell)) if cell else '' for cell in row]
+                        latex_content.append(" & ".join(cleaned_row) + " \\\\")
+                    
+                    latex_content.append("\\end{tabular}")
+                    latex_content.append("\\end{table}")
+
+    return latex_content
+
+def cached_page_to_latex(page, table_detection="balanced", stats=None, cache=None, memo=None,
+                         profiler=NULL_PROFILER):
+    """
+    Convert a page, reusing its LaTeX from the page cache when the page is unchanged.
+    
+    Args:
+        page (pdfplumber.page.Page): Page to convert
+        table_detection (str): Pre-check strictness, one of TABLE_DETECTION_MODES
+        stats (Counter, optional): Incremented with the path the page took, or
+            "cached_pages" when it was reused
+        cache (PageCache, optional): Page cache; None converts unconditionally
+        memo (dict, optional): Per-document memo for page_fingerprint
+        profiler (StageProfiler, optional): Records time and allocations per stage
+        
+    Returns:
+        list: LaTeX lines for the page, in output order
+    """
+    if cache is None:
+        return page_to_latex(page, table_detection, stats, profiler)
+
+    with profiler.stage("page_cache"):
+        key = make_page_key(page_fingerprint(page, memo), converter_settings(table_detection=table_detection))
+        lines = cache.get(key)
+    if lines is not None:
+        if stats is not None:
+            stats["cached_pages"] += 1
+        return lines
+
+    lines = page_to_latex(page, table_detection, stats, profiler)
+    with profiler.stage("page_cache"):
+        cache.set(key, lines)
+    return lines
+
+def convert_page_range(pdf_path, start, stop, table_detection="balanced", page_cache=None,
+                       profile=None):
+    """
+    Worker entry point: open the PDF and convert pages [start, stop).
+    
+    Args:
+        pdf_path (str): Path to input PDF file
+        start (int): First page index (0-based)
+        stop (int): Page index to stop before
+        table_detection (str): Pre-check strictness, one of TABLE_DETECTION_MODES
+        page_cache (str, optional): Path of the page cache file to share
+        profile (dict, optional): StageProfiler keyword arguments; None disables profiling
+        
+    Returns:
+        tuple: (LaTeX lines for the pages in page order, Counter of page paths,
+        profile as StageProfiler.to_dict() or None)
+    """
+    latex_content = []
+    stats = Counter()
+    cache = PageCache(page_cache) if page_cache else None
+    profiler = StageProfiler(**profile).start() if profile is not None else NULL_PROFILER
+    memo = {}
+    try:
+        with profiler.stage("open"):
+            pdf = pdfplumber.open(pdf_path)
+        with pdf:
+            for index in range(start, stop):
+                profiler.page(index + 1)
+                page = pdf.pages[index]
+                latex_content.extend(cached_page_to_latex(page, table_detection, stats, cache, memo, profiler))
+                page.close()
+    finally:
+        profiler.stop()
+        if cache is not None:
+            cache.close()
+    return latex_content, stats, profiler.to_dict() if profiler.enabled else None
+
+def page_ranges(page_count, workers, chunks_per_worker=4):
+    """
+    Split pages into contiguous ranges, several per worker so uneven pages balance out.
+    
+    Args:
+        page_count (int): Number of pages in the document
+        workers (int): Number of worker processes
+        chunks_per_worker (int): Ranges to create per worker
+        
+    Returns:
+        list: (start, stop) tuples covering every page in order
+    """
+    size = max(1, -(-page_count // (workers * chunks_per_worker)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def convert_pages_parallel(pdf_path, workers, table_detection="balanced", stats=None, page_cache=None,
+                           profiler=NULL_PROFILER):
+    """
+    Convert all pages using a pool of worker processes.
+    
+    Each worker opens the PDF itself. Fragments are yielded in page order, so
+    the result is identical to converting the pages serially.
+    
+    Args:
+        pdf_path (str): Path to input PDF file
+        workers (int): Number of worker processes
+        table_detection (str): Pre-check strictness, one of TABLE_DETECTION_MODES
+        stats (Counter, optional): Receives the page path counts from every worker
+        page_cache (PageCache, optional): Cache whose file every worker opens
+        profiler (StageProfiler, optional): Receives every worker's stage measurements
+        
+    Yields:
+        list: LaTeX lines for each page range, in page order
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+
+    ranges = page_ranges(page_count, workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as executor:
+        results = executor.map(
+            convert_page_range,
+            [str(pdf_path)] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges],
+            [table_detection] * len(ranges),
+            [page_cache.path if page_cache else None] * len(ranges),
+            [{"trace_memory": profiler.trace_memory} if profiler.enabled else None] * len(ranges),
+        )
+        for fragment, range_stats, range_profile in results:
+            if stats is not None:
+                stats.update(range_stats)
+            if range_profile is not None:
+                profiler.merge(range_profile)
+            yield fragment
+
+def iter_page_fragments(pdf_path, workers=1, table_detection="balanced", stats=None, page_cache=None,
+                        profiler=NULL_PROFILER, collect_every=None):
+    """
+    Convert a PDF lazily, yielding LaTeX as pages are converted.
+    
+    Each page's cached layout objects are released as soon as the page is
+    done; with collect_every they are also collected, so memory does not grow
+    with the number of pages.
+    
+    Args:
+        pdf_path (str): Path to input PDF file
+        workers (int): Number of processes to spread pages across (1 converts in-process)
+        table_detection (str): Pre-check strictness, one of TABLE_DETECTION_MODES
+        stats (Counter, optional): Incremented with the path each page took
+        page_cache (PageCache, optional): Reuse LaTeX for pages converted before
+        profiler (StageProfiler, optional): Records time and allocations per stage and page
+        collect_every (int, optional): Run a garbage collection after this many
+            parsed pages (page cache hits don't count); None leaves it to Python
+        
+    Yields:
+        list: LaTeX lines for each page (each page range when workers > 1), in page order
+    """
+    if workers > 1:
+        yield from convert_pages_parallel(pdf_path, workers, table_detection, stats, page_cache, profiler)
+        return
+
+    memo = {}
+    if stats is None:
+        stats = Counter()  # tells cache hits from parsed pages
+    parsed = 0
+    with profiler.stage("open"):
+        pdf = pdfplumber.open(pdf_path)
+    with pdf:
+        for number, page in enumerate(pdf.pages, 1):
+            profiler.page(number)
+            cached = stats["cached_pages"]
+            fragment = cached_page_to_latex(page, table_detection, stats, page_cache, memo, profiler)
+            page.close()
+            if collect_every and stats["cached_pages"] == cached:
+                parsed += 1
+                if parsed % collect_every == 0:
+                    gc.collect()
+            profiler.page(None)
+            yield fragment
+
+def write_latex(f, fragments, profiler=NULL_PROFILER):
+    """
+    Write a complete LaTeX document, one fragment at a time.
+    
+    The output is identical to joining the preamble, every fragment's lines
+    and the closing line with newlines.
+    
+    Args:
+        f (file): Text file open for writing
+        fragments (iterable): Lists of LaTeX lines, in document order
+        profiler (StageProfiler, optional): Times the writes as the "write" stage
+    """
+    with profiler.stage("write"):
+        f.write('\n'.join(LATEX_PREAMBLE))
+    for fragment in fragments:
+        if fragment:
+            with profiler.stage("write"):
+                f.write('\n')
+                f.write('\n'.join(fragment))
+    with profiler.stage("write"):
+        f.write('\n' + LATEX_END)
+
+def pdf_to_latex(pdf_path, output_path=None, workers=1, stream=False,
+                 table_detection="balanced", stats=None, page_cache=None, profiler=None):
     """
     Convert PDF to LaTeX format, attempting to preserve structure and formatting.
     
     Args:
         pdf_path (str): Path to input PDF file
         output_path (str, optional): Path for output LaTeX file. If None, uses PDF name with .tex extension
+        workers (int): Number of processes to spread pages across (1 converts in-process)
+        stream (bool): Write each page to the output as soon as it is converted instead
+            of holding the whole document in memory
+        table_detection (str): How sure the pre-check must be that a page has no
+            tables before skipping detection, one of TABLE_DETECTION_MODES
+        stats (Counter, optional): Filled with how many pages ran table detection
+            ("table_detection_pages") and how many skipped it ("text_only_pages"),
+            plus pages reused from the page cache ("cached_pages")
+        page_cache (PageCache or str, optional): Page cache, or the path of one to
+            open, so that only pages that changed since an earlier conversion are
+            extracted again
+        profiler (StageProfiler, optional): Records time and allocations for each
+            stage (open, extraction, cleanup, rendering, write), overall and per page
         
     Returns:
         tuple: (success: bool, message: str, output_path: str)
     """
+    cache = page_cache
+    if profiler is None:
+        profiler = NULL_PROFILER
+    profiler.start()
     try:
         pdf_path = Path(pdf_path)
         if not pdf_path.exists():
@@ -46,52 +506,34 @@ def pdf_to_latex(pdf_path, output_path=None):
         if output_path is None:
             output_path = pdf_path.with_suffix('.tex')
         
-        latex_content = []
-        latex_content.append("\\documentclass{article}")
-        latex_content.append("\\usepackage[utf8]{inputenc}")
-        latex_content.append("\\usepackage{amsmath}")
-        latex_content.append("\\usepackage{graphicx}")
-        latex_content.append("\\begin{document}")
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                # Extract text and tables
-                text = page.extract_text()
-                tables = page.extract_tables()
-                
-                if text:
-                    text = clean_text(text)
-                    
-                    # Attempt to identify and convert sections
-                    sections = text.split('\n')
-                    for section in sections:
-                        # Check for potential headers
-                        if re.match(r'^[0-9.]*\s*[A-Z][^.!?]*$', section.strip()):
-                            latex_content.append(f"\n\\section{{{section.strip()}}}")
-                        else:
-                            # Regular paragraph
-                            latex_content.append(f"\n{section}")
-                
-                # Convert tables to LaTeX format
-                if tables:
-                    for table in tables:
-                        if table:
-                            latex_content.append("\\begin{table}[h!]")
-                            latex_content.append("\\begin{tabular}{" + "l" * len(table[0]) + "}")
-                            
-                            for row in table:
-                                # Clean and escape special characters
-                                cleaned_row = [str(cell).replace('_', '\\_').replace('%', '\\%') if cell else '' for cell in row]
-                                latex_content.append(" & ".join(cleaned_row) + " \\\\")
-                            
-                            latex_content.append("\\end{tabular}")
-                            latex_content.append("\\end{table}")
-        
-        latex_content.append("\\end{document}")
-        
-        # Write to output file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(latex_content))
+        if table_detection not in TABLE_DETECTION_MODES:
+            return False, f"Unknown table detection mode: {table_detection}", None
+
+        if page_cache is not None and not isinstance(page_cache, PageCache):
+            cache = PageCache(page_cache)
+
+        fragments = iter_page_fragments(pdf_path, workers, table_detection, stats, cache, profiler,
+                                        collect_every=STREAM_COLLECT_EVERY if stream else None)
+
+        if stream:
+            # Pages go straight to a partial file that replaces the output only once complete
+            partial_path = Path(f"{output_path}.part")
+            try:
+                with open(partial_path, 'w', encoding='utf-8') as f:
+                    write_latex(f, fragments, profiler)
+                os.replace(partial_path, output_path)
+            finally:
+                partial_path.unlink(missing_ok=True)
+        else:
+            latex_content = list(LATEX_PREAMBLE)
+            for fragment in fragments:
+                latex_content.extend(fragment)
+            latex_content.append(LATEX_END)
+            
+            # Write to output file
+            with profiler.stage("write"):
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(latex_content))
         
         return True, f"Successfully converted PDF to LaTeX: {output_path}", str(output_path)
     
@@ -99,24 +541,106 @@ def pdf_to_latex(pdf_path, output_path=None):
         error_msg = f"Error converting PDF to LaTeX: {str(e)}"
         logger.error(error_msg)
         return False, error_msg, None
+    finally:
+        profiler.stop()
+        if cache is not page_cache:
+            cache.close()
 
 def main():
     """
     Command line interface for PDF to LaTeX conversion.
     """
     import argparse
+    import json
+    import sys
     
     parser = argparse.ArgumentParser(description='Convert PDF to LaTeX format')
-    parser.add_argument('pdf_path', help='Path to input PDF file')
+    parser.add_argument('pdf_path', nargs='+',
+                        help='Path to input PDF file, or several files, directories or glob patterns')
     parser.add_argument('--output', '-o', help='Path for output LaTeX file (optional)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Number of processes to convert pages with (default: 1)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write pages as they are converted (constant memory for large PDFs)')
+    parser.add_argument('--table-detection', choices=TABLE_DETECTION_MODES, default='balanced',
+                        help='How sure the pre-check must be that a page has no tables before '
+                             'skipping table detection (default: balanced)')
+    parser.add_argument('--page-cache', nargs='?', const=DEFAULT_PAGE_CACHE_PATH, metavar='PATH',
+                        help='Reuse LaTeX for pages unchanged since an earlier conversion '
+                             f'(default file: {DEFAULT_PAGE_CACHE_PATH})')
+
+    profile_group = parser.add_argument_group('profiling (single input)')
+    profile_group.add_argument('--profile', action='store_true',
+                               help='Print time and allocations per stage and the slowest pages')
+    profile_group.add_argument('--profile-json', metavar='PATH', help='Also write the full profile as JSON')
+    profile_group.add_argument('--profile-top', type=int, default=5, metavar='N',
+                               help='Number of slowest pages to list (default: 5)')
+    profile_group.add_argument('--profile-no-memory', action='store_true',
+                               help='Time stages only; allocation tracing slows conversion down')
+
+    batch_group = parser.add_argument_group('batch mode (several inputs, directories or globs)')
+    batch_group.add_argument('--output-dir', help='Directory for .tex files (default: next to each PDF)')
+    batch_group.add_argument('--manifest', help='Manifest of converted inputs (default: in the output directory)')
+    batch_group.add_argument('--summary', help='Write the JSON run summary here instead of stdout')
+    batch_group.add_argument('--jobs', '-j', type=int, help='Files to convert concurrently (default: CPU count)')
+    batch_group.add_argument('--force', action='store_true', help='Convert every input, even if up to date')
     
     args = parser.parse_args()
-    
-    success, message, output_path = pdf_to_latex(args.pdf_path, args.output)
-    if success:
-        logger.info(message)
+
+    # one existing file, or one literal path that doesn't exist (reported as
+    # not found), is a single conversion; directories and patterns are batches
+    first = args.pdf_path[0]
+    batch = (
+        len(args.pdf_path) > 1
+        or Path(first).is_dir()
+        or (not Path(first).exists() and any(char in first for char in "*?["))
+        or any((args.output_dir, args.manifest, args.summary, args.jobs, args.force))
+    )
+    profiling = args.profile or args.profile_json
+    if not batch:
+        stats = Counter()
+        profiler = StageProfiler(trace_memory=not args.profile_no_memory) if profiling else None
+        success, message, output_path = pdf_to_latex(
+            args.pdf_path[0], args.output, workers=args.workers, stream=args.stream,
+            table_detection=args.table_detection, stats=stats, page_cache=args.page_cache,
+            profiler=profiler
+        )
+        if success:
+            logger.info(message)
+            logger.info(
+                "Table detection ran on %d pages, skipped on %d text-only pages",
+                stats["table_detection_pages"], stats["text_only_pages"]
+            )
+            if args.page_cache:
+                logger.info("Reused %d unchanged pages from the page cache", stats["cached_pages"])
+        else:
+            logger.error(message)
+        if profiler is not None:
+            print(profiler.report(top=args.profile_top))
+            if args.profile_json:
+                with open(args.profile_json, 'w', encoding='utf-8') as f:
+                    json.dump(profiler.to_dict(), f, indent=2)
+        return
+
+    if args.output:
+        parser.error("--output takes a single input file; use --output-dir in batch mode")
+    if profiling:
+        parser.error("--profile takes a single input file")
+
+    from batch_convert import convert_batch
+
+    summary = convert_batch(
+        args.pdf_path, output_dir=args.output_dir, manifest_path=args.manifest,
+        jobs=args.jobs, force=args.force, workers=args.workers, stream=args.stream,
+        table_detection=args.table_detection, page_cache=args.page_cache
+    )
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
     else:
-        logger.error(message)
+        print(json.dumps(summary, indent=2))
+    if summary["failed"]:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
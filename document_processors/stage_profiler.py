@@ -0,0 +1,225 @@
+"""
+Per-stage timing and allocation profiling for pdf_to_latex.
+
+Conversion code wraps each stage in ``profiler.stage(name)``. The default
+NULL_PROFILER hands back one shared no-op context manager, so an unprofiled
+run pays only for the ``with`` statements. A StageProfiler records wall time
+and, with trace_memory, the bytes each stage allocated (tracemalloc), both
+for the whole document and per page.
+"""
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Stages in pipeline order, for reports
+STAGES = (
+    "open", "page_cache", "parse", "find_tables", "extract_text", "extract_tables",
+    "clean_text", "sections", "render_tables", "write",
+)
+
+
+class _NullProfiler:
+    """Profiler stand-in that records nothing."""
+
+    enabled = False
+    _stage = nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def page(self, number):
+        pass
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "started", "memory")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        allocated = peak = 0
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated = current - self.memory
+            peak -= self.memory
+        self.profiler.record(self.name, elapsed, allocated, peak)
+        return False
+
+
+class StageProfiler:
+    """
+    Collects time and allocations per stage and per page.
+
+    Stages do not nest. Time spent outside any stage (e.g. generator overhead)
+    is not attributed.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}  # name -> [calls, seconds, allocated bytes, peak bytes]
+        self.pages = {}   # page number -> {name: seconds}
+        self._current_page = None
+        self._depth = 0
+        self._started_tracing = False
+
+    def start(self):
+        """Begin tracing allocations, if enabled and not already traced. Calls may nest."""
+        if self._depth == 0 and self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._depth += 1
+        return self
+
+    def stop(self):
+        """Undo one start(); tracing started by the outermost start() ends with it."""
+        self._depth -= 1
+        if self._depth == 0 and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def stage(self, name):
+        """
+        Context manager timing one stage.
+
+        Args:
+            name (str): Stage name, normally one of STAGES
+        """
+        return _Stage(self, name)
+
+    def page(self, number):
+        """Attribute the following stages to a page (1-based), or None for document-level work."""
+        self._current_page = number
+
+    def record(self, name, seconds, allocated=0, peak=0):
+        """Add one stage measurement."""
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0, 0.0, 0, 0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += allocated
+        totals[3] = max(totals[3], peak)
+        if self._current_page is not None:
+            page = self.pages.setdefault(self._current_page, {})
+            page[name] = page.get(name, 0.0) + seconds
+
+    def merge(self, data):
+        """
+        Fold in measurements from another profiler (e.g. a worker process).
+
+        Args:
+            data (dict): Result of that profiler's to_dict()
+        """
+        for name, stage in data["stages"].items():
+            totals = self.stages.setdefault(name, [0, 0.0, 0, 0])
+            totals[0] += stage["calls"]
+            totals[1] += stage["seconds"]
+            totals[2] += stage["allocated_bytes"]
+            totals[3] = max(totals[3], stage["peak_bytes"])
+        for page in data["pages"]:
+            merged = self.pages.setdefault(page["page"], {})
+            for name, seconds in page["stages"].items():
+                merged[name] = merged.get(name, 0.0) + seconds
+
+    def slowest_pages(self, count=5):
+        """
+        Pages ordered by total time spent in them.
+
+        Args:
+            count (int): Number of pages to return
+
+        Returns:
+            list: (page number, seconds, {stage: seconds}) tuples, slowest first
+        """
+        pages = [(number, sum(stages.values()), stages) for number, stages in self.pages.items()]
+        pages.sort(key=lambda page: page[1], reverse=True)
+        return pages[:count]
+
+    def to_dict(self):
+        """
+        Machine-readable profile.
+
+        Returns:
+            dict: stages (calls, seconds, allocated_bytes, peak_bytes per stage),
+            pages (per-page stage seconds, in page order) and total_seconds
+        """
+        return {
+            "trace_memory": self.trace_memory,
+            "total_seconds": sum(totals[1] for totals in self.stages.values()),
+            "stages": {
+                name: {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "allocated_bytes": allocated,
+                    "peak_bytes": peak,
+                }
+                for name, (calls, seconds, allocated, peak) in self._ordered_stages()
+            },
+            "pages": [
+                {"page": number, "seconds": sum(stages.values()), "stages": stages}
+                for number, stages in sorted(self.pages.items())
+            ],
+        }
+
+    def report(self, top=5):
+        """
+        Human-readable per-stage table followed by the slowest pages.
+
+        Args:
+            top (int): Number of slowest pages to list
+
+        Returns:
+            str: The report
+        """
+        total = sum(totals[1] for totals in self.stages.values()) or 1.0
+        lines = [f"{'stage':<16}{'calls':>7}{'total s':>10}{'mean ms':>10}{'share':>8}"
+                 f"{'alloc MB':>10}{'peak MB':>9}"]
+        for name, (calls, seconds, allocated, peak) in self._ordered_stages():
+            lines.append(
+                f"{name:<16}{calls:>7}{seconds:>10.3f}{seconds / calls * 1000:>10.2f}"
+                f"{seconds / total:>8.1%}{allocated / 1e6:>10.2f}{peak / 1e6:>9.2f}"
+            )
+        if not self.trace_memory:
+            lines.append("(allocation tracing off)")
+
+        slowest = self.slowest_pages(top)
+        if slowest:
+            lines.append("")
+            lines.append(f"slowest {len(slowest)} of {len(self.pages)} pages:")
+            for number, seconds, stages in slowest:
+                stage, stage_seconds = max(stages.items(), key=lambda item: item[1])
+                lines.append(f"  page {number:>5}{seconds * 1000:>10.1f} ms   (most in {stage}: "
+                             f"{stage_seconds * 1000:.1f} ms)")
+        return "\n".join(lines)
+
+    def _ordered_stages(self):
+        order = {name: index for index, name in enumerate(STAGES)}
+        return sorted(self.stages.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
@@ -0,0 +1,190 @@
+"""
+Deterministic synthetic PDFs for exercising and benchmarking pdf_to_latex.
+
+The files are written by hand in plain PDF syntax (Helvetica text, stroked
+ruling lines), so no PDF library is needed. The same seed always produces
+byte-identical files.
+"""
+import random
+from pathlib import Path
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+
+WORDS = (
+    "acme roadrunner anvil rocket desert canyon coyote catapult spring magnet "
+    "dynamite tunnel paint boulder cliff trap order refund repair catalog "
+    "product customer delivery schedule invoice warranty shipment quality "
+    "report analysis result method sample measure design system value"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class _Page:
+    """Accumulates drawing operators for one page content stream."""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, size=10):
+        self.ops.append(f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET")
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(f"{x1:.1f} {y1:.1f} m {x2:.1f} {y2:.1f} l S")
+
+    def content(self):
+        return "\n".join(self.ops).encode("latin-1")
+
+
+def _sentence(rng, words=12):
+    sentence = " ".join(rng.choice(WORDS) for _ in range(words))
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def _paragraph_lines(rng, count, width=85):
+    """Wrap random sentences into lines, hyphenating some long words across lines."""
+    lines, current = [], ""
+    while len(lines) < count:
+        for word in _sentence(rng).split():
+            if len(current) + len(word) + 1 > width:
+                if len(word) > 6 and rng.random() < 0.3:
+                    cut = len(word) // 2
+                    lines.append(f"{current} {word[:cut]}-".strip())
+                    current = word[cut:]
+                else:
+                    lines.append(current)
+                    current = word
+            else:
+                current = f"{current} {word}".strip()
+    return lines[:count]
+
+
+def _draw_text(page, rng, top, bottom, section):
+    y = top
+    page.text(MARGIN, y, f"{section} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}", size=14)
+    y -= 24
+    while y > bottom:
+        for line in _paragraph_lines(rng, rng.randint(4, 8)):
+            if y <= bottom:
+                break
+            page.text(MARGIN, y, line)
+            y -= 13
+        y -= 10
+    return y
+
+
+def _draw_table(page, rng, top, rows, cols):
+    col_width = (PAGE_WIDTH - 2 * MARGIN) / cols
+    row_height = 18
+    bottom = top - rows * row_height
+    for r in range(rows + 1):
+        y = top - r * row_height
+        page.line(MARGIN, y, PAGE_WIDTH - MARGIN, y)
+    for c in range(cols + 1):
+        x = MARGIN + c * col_width
+        page.line(x, top, x, bottom)
+    for r in range(rows):
+        for c in range(cols):
+            if r == 0:
+                cell = rng.choice(WORDS).title()
+            elif c == 0:
+                cell = f"{rng.choice(WORDS)}_{r}"
+            else:
+                cell = f"{rng.randint(0, 999)}.{rng.randint(0, 99):02d}%"
+            page.text(MARGIN + c * col_width + 4, top - (r + 1) * row_height + 5, cell, size=9)
+    return bottom
+
+
+def text_page(rng, number):
+    """A page of headed prose with a page number footer."""
+    page = _Page()
+    _draw_text(page, rng, PAGE_HEIGHT - MARGIN, MARGIN + 20, f"{number}.")
+    page.text(PAGE_WIDTH / 2, MARGIN / 2, str(number))
+    return page.content()
+
+
+def table_page(rng, number):
+    """A page holding two ruled tables."""
+    page = _Page()
+    bottom = _draw_table(page, rng, PAGE_HEIGHT - MARGIN, rows=rng.randint(8, 14), cols=rng.randint(3, 6))
+    _draw_table(page, rng, bottom - 40, rows=rng.randint(6, 10), cols=rng.randint(3, 6))
+    page.text(PAGE_WIDTH / 2, MARGIN / 2, str(number))
+    return page.content()
+
+
+def mixed_page(rng, number):
+    """Prose on the top half of the page and a ruled table below it."""
+    page = _Page()
+    _draw_text(page, rng, PAGE_HEIGHT - MARGIN, PAGE_HEIGHT / 2 + 20, f"{number}.")
+    _draw_table(page, rng, PAGE_HEIGHT / 2, rows=rng.randint(6, 10), cols=rng.randint(3, 5))
+    page.text(PAGE_WIDTH / 2, MARGIN / 2, str(number))
+    return page.content()
+
+
+PAGE_KINDS = {"text": text_page, "table": table_page, "mixed": mixed_page}
+
+
+def write_pdf(path, contents):
+    """
+    Write a PDF whose pages draw the given content streams.
+
+    Args:
+        path (str or Path): Output file
+        contents (iterable): One content stream (bytes) per page
+    """
+    contents = list(contents)
+    page_ids = [4 + 2 * i for i in range(len(contents))]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: (
+            f"<< /Type /Pages /Count {len(contents)} /Kids ["
+            + " ".join(f"{pid} 0 R" for pid in page_ids)
+            + "] >>"
+        ).encode("latin-1"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    for pid, content in zip(page_ids, contents):
+        objects[pid] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>"
+        ).encode("latin-1")
+        objects[pid + 1] = (
+            f"<< /Length {len(content)} >>\nstream\n".encode("latin-1")
+            + content + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n".encode("latin-1") + objects[number] + b"\nendobj\n"
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for number in sorted(objects):
+        out += f"{offsets[number]:010d} 00000 n \n".encode("latin-1")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    Path(path).write_bytes(bytes(out))
+
+
+def make_pdf(path, kinds, seed=0):
+    """
+    Write a deterministic synthetic PDF.
+
+    Args:
+        path (str or Path): Output file
+        kinds (list): Page kind per page: "text", "table" or "mixed"
+        seed (int): Random seed for the page contents
+
+    Returns:
+        Path: The written file
+    """
+    rng = random.Random(seed)
+    write_pdf(path, (PAGE_KINDS[kind](rng, number) for number, kind in enumerate(kinds, 1)))
+    return Path(path)
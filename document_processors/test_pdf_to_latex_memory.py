@@ -0,0 +1,25 @@
+"""
+Peak memory of streaming conversion must not grow with the page count.
+
+Run with: python -m pytest document_processors
+"""
+from bench_pdf_to_latex import peak_memory, warm_up
+from synthetic_pdfs import make_pdf
+
+# Same sizes and limit as `python bench_pdf_to_latex.py memory`
+SMALL_PAGES, LARGE_PAGES = 10, 40
+MAX_GROWTH = 1.5
+
+
+def test_streaming_peak_memory_stays_flat(tmp_path):
+    warm_up(tmp_path)
+    peaks = []
+    for pages in (SMALL_PAGES, LARGE_PAGES):
+        pdf_path = make_pdf(tmp_path / f"mixed_{pages}.pdf", ["mixed"] * pages)
+        peaks.append(peak_memory(pdf_path, tmp_path / f"mixed_{pages}.tex", stream=True))
+
+    growth = peaks[1] / peaks[0]
+    assert growth <= MAX_GROWTH, (
+        f"peak traced memory grew {growth:.2f}x from {SMALL_PAGES} to {LARGE_PAGES} pages "
+        f"({peaks[0] / 1e6:.2f} MB -> {peaks[1] / 1e6:.2f} MB)"
+    )